@@ -0,0 +1,266 @@
+"""GPIO backend that drives DMX dimmers over Art-Net.
+
+Channels are DMX slots rather than header pins: channel n is slot
+n % 512 + 1 of universe FIRST_UNIVERSE + n // 512. A HIGH channel is
+sent as LEVEL_ON and a LOW one as 0, so the cue engine's relay_on()/
+relay_off() and bank writes turn dimmers fully on and off; output_level()
+sets any level in between. The API matches RPi.GPIO and the emulators:
+
+    from ArtNetGPIO import GPIO
+    GPIO.TARGET = ("2.255.255.255", 6454)
+    GPIO.UNIVERSES = 2
+
+Each universe is one preallocated ArtDmx packet, and channel levels are
+written straight into its data bytes, so nothing is allocated per
+channel or per frame. A write sends the universes it changed at once;
+on top of that a refresh thread resends every universe REFRESH_HZ times
+a second, as DMX receivers expect a steady stream and drop to their
+fail-safe state without one. A failed send is counted in send_errors
+rather than raised, so the refresh carries on through a network outage.
+Relays are driven HIGH for ON, so use ACTIVE_LOW = False with it.
+
+ArtNetReceiver listens for ArtDmx packets and keeps every frame it gets,
+for checking contents and timing on a box without any DMX gear (see
+bench_artnet.py). Only Art-Net is spoken; sACN (E1.31) is not.
+"""
+
+import socket
+import struct
+import threading
+import time
+
+ARTNET_PORT = 6454
+
+# Frames per second of the refresh; DMX runs at up to 44
+REFRESH_HZ = 40
+
+SLOTS = 512
+
+_ID = b"Art-Net\x00"
+_OP_DMX = 0x5000
+_PROTOCOL_VERSION = 14
+# ID, OpCode (little endian), ProtVer, Sequence, Physical, SubUni, Net, Length
+_DMX_HEADER = struct.Struct("<8sH2sBBBBH")
+_DATA = _DMX_HEADER.size
+
+
+def _dmx_packet(universe):
+    # The Length field is big endian, unlike the OpCode
+    packet = bytearray(_DATA + SLOTS)
+    _DMX_HEADER.pack_into(
+        packet, 0, _ID, _OP_DMX, struct.pack(">H", _PROTOCOL_VERSION), 0, 0,
+        universe & 0xFF, universe >> 8 & 0x7F, 0,
+    )
+    struct.pack_into(">H", packet, _DATA - 2, SLOTS)
+    return packet
+
+
+def parse_dmx(data):
+    """(universe, sequence, levels) of an ArtDmx packet, or None"""
+    if len(data) < _DATA:
+        return None
+    ident, opcode, _, sequence, _, subuni, net, _ = _DMX_HEADER.unpack_from(data)
+    (length,) = struct.unpack_from(">H", data, _DATA - 2)
+    if ident != _ID or opcode != _OP_DMX or len(data) != _DATA + length:
+        return None
+    return net << 8 | subuni, sequence, bytes(data[_DATA:])
+
+
+class ArtNetReceiver:
+    """Collects (monotonic time, universe, sequence, levels) of ArtDmx packets"""
+
+    def __init__(self, host="127.0.0.1", port=ARTNET_PORT):
+        self.frames = []
+        self.bad_packets = 0
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind((host, port))
+        self._sock.settimeout(0.1)
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="artnet-receiver", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopping:
+            try:
+                data = self._sock.recv(2048)
+            except socket.timeout:
+                continue
+            received = time.monotonic()
+            dmx = parse_dmx(data)
+            if dmx is None:
+                self.bad_packets += 1
+            else:
+                self.frames.append((received, *dmx))
+
+    def close(self):
+        self._stopping = True
+        self._thread.join()
+        self._sock.close()
+
+
+class GPIO:
+
+    # constants
+    LOW = 0
+    HIGH = 1
+    OUT = 2
+    IN = 3
+    PUD_OFF = 4
+    PUD_DOWN = 5
+    PUD_UP = 6
+    BCM = 7
+
+    # Where packets go: a node's address, or the Art-Net broadcast address
+    TARGET = ("127.0.0.1", ARTNET_PORT)
+    FIRST_UNIVERSE = 0
+    UNIVERSES = 1
+
+    # DMX level of a HIGH channel
+    LEVEL_ON = 255
+
+    # flags
+    setModeDone = False
+
+    # one ArtDmx packet per universe, with the levels in place
+    _packets = []
+    _out_mask = 0
+    _sock = None
+    # held while a packet is changed or sent, so frames go out whole
+    _lock = threading.Lock()
+    _stopping = None
+    _refresher = None
+    # sendto() calls that failed, e.g. while the network was down
+    send_errors = 0
+
+    # Extra functions
+    def checkModeValidator():
+        if GPIO.setModeDone == False:
+            raise Exception('Setup your GPIO mode. Must be set to BCM')
+
+    def open():
+        if GPIO._sock is not None:
+            return
+        GPIO._packets = [_dmx_packet(GPIO.FIRST_UNIVERSE + u) for u in range(GPIO.UNIVERSES)]
+        GPIO._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        GPIO._sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        GPIO._stopping = threading.Event()
+        GPIO._refresher = threading.Thread(target=GPIO._refresh, name="artnet-refresh", daemon=True)
+        GPIO._refresher.start()
+
+    def close():
+        if GPIO._sock is None:
+            return
+        GPIO._stopping.set()
+        GPIO._refresher.join()
+        GPIO._refresher = None
+        GPIO._sock.close()
+        GPIO._sock = None
+
+    def _send(universe_mask):
+        # Caller holds _lock; bit u = index of a universe to send
+        for u, packet in enumerate(GPIO._packets):
+            if universe_mask >> u & 1:
+                # Sequence runs 1..255; 0 would tell receivers not to reorder
+                packet[12] = packet[12] % 255 + 1
+                try:
+                    GPIO._sock.sendto(packet, GPIO.TARGET)
+                except OSError:
+                    # Network down or unreachable for now; the refresh
+                    # sends the levels again once it is back
+                    GPIO.send_errors += 1
+
+    def _refresh():
+        period = 1 / REFRESH_HZ
+        every_universe = (1 << len(GPIO._packets)) - 1
+        next_frame = time.monotonic()
+        while True:
+            next_frame += period
+            if GPIO._stopping.wait(max(0.0, next_frame - time.monotonic())):
+                return
+            with GPIO._lock:
+                GPIO._send(every_universe)
+
+    def _set(mask, level):
+        # Write level into every slot in mask; return the universes touched
+        universes = 0
+        packets = GPIO._packets
+        while mask:
+            low = mask & -mask
+            mask ^= low
+            u, slot = divmod(low.bit_length() - 1, SLOTS)
+            packets[u][_DATA + slot] = level
+            universes |= 1 << u
+        return universes
+
+    # GPIO LIBRARY Functions
+    def setmode(mode):
+        if not isinstance(mode, int):
+            raise TypeError('Argument mode must be {}'.format(int))
+        GPIO.open()
+        GPIO.setModeDone = mode == GPIO.BCM
+
+    def setwarnings(flag):
+        pass
+
+    def setup(channel, state, initial=-1, pull_up_down=-1):
+        GPIO.checkModeValidator()
+
+        if not 0 <= channel < GPIO.UNIVERSES * SLOTS:
+            raise Exception('Channel ' + str(channel) + ' does not exist')
+        if state != GPIO.OUT:
+            raise Exception('DMX channels are outputs only')
+
+        # Goes out with the next refresh, so setting up a whole universe
+        # is not a burst of packets
+        GPIO._out_mask |= 1 << channel
+        level = GPIO.LEVEL_ON if initial == GPIO.HIGH else 0
+        with GPIO._lock:
+            GPIO._set(1 << channel, level)
+
+    def output(channel, outmode):
+        if isinstance(channel, (list, tuple)):
+            if not isinstance(outmode, (list, tuple)):
+                outmode = [outmode] * len(channel)
+            set_mask = clear_mask = 0
+            for pin, level in zip(channel, outmode):
+                if level:
+                    set_mask |= 1 << pin
+                else:
+                    clear_mask |= 1 << pin
+            GPIO.output_bank(set_mask, clear_mask)
+            return
+
+        if outmode != GPIO.LOW and outmode != GPIO.HIGH:
+            raise Exception('Output must be set to HIGH/LOW')
+        GPIO.output_level(channel, GPIO.LEVEL_ON if outmode else 0)
+
+    def output_level(channel, level):
+        """Set one channel to a DMX level, 0-255"""
+        if not GPIO._out_mask >> channel & 1:
+            GPIO.checkModeValidator()
+            raise Exception('GPIO must be setup before used')
+        with GPIO._lock:
+            GPIO._send(GPIO._set(1 << channel, level))
+
+    def output_bank(set_mask, clear_mask):
+        """Set and clear any channels, sending each changed universe once"""
+        if set_mask & clear_mask:
+            raise Exception('A pin cannot be both set and cleared')
+        if (set_mask | clear_mask) & ~GPIO._out_mask:
+            GPIO.checkModeValidator()
+            raise Exception('GPIO must be setup before used')
+        with GPIO._lock:
+            GPIO._send(GPIO._set(set_mask, GPIO.LEVEL_ON) | GPIO._set(clear_mask, 0))
+
+    def input(channel):
+        raise Exception('DMX channels are outputs only')
+
+    def cleanup():
+        # Black out before the stream stops, rather than leave the dimmers
+        # to their fail-safe
+        if GPIO._sock is not None:
+            with GPIO._lock:
+                GPIO._send(GPIO._set(GPIO._out_mask, 0))
+            GPIO.close()
+        GPIO._out_mask = 0
+        GPIO.setModeDone = False
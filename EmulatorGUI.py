@@ -13,6 +13,17 @@ dictionaryPins = {}
 dictionaryPinsTkinter = {}
 
 GPIONames=["14","15","18","23","24","25","8","7","12","16","20","21","2","3","4","17","27","22","10","9","11","5","6","13","19","26"]
+GPIOMask = sum(1 << int(gpioID) for gpioID in GPIONames)
+
+#pins are only drawn by the Tk thread, once per frame. GPIO calls from any
+#thread just set bits in dirtyMask, so output() never waits for the UI and a
+#burst of writes to one pin costs a single redraw
+FRAME_MS = 33
+dirtyMask = 0
+dirtyLock = threading.Lock()
+
+#gpioID -> (mode, value) as last drawn, to skip widgets that look the same
+drawnPins = {}
     
 class App(threading.Thread):
     
@@ -262,9 +273,14 @@ class App(threading.Thread):
 
 
         self.root.geometry('%dx%d+%d+%d' % (1300, 100, 0, 0))
-       
+
+        self.root.after(FRAME_MS, self.drawFrame)
         self.root.mainloop()       
 
+    def drawFrame(self):
+        drawDirtyPins()
+        self.root.after(FRAME_MS, self.drawFrame)
+
         
 
 ##        button1.unbind("<Button-1>")
@@ -275,15 +291,27 @@ app = App()
 
 def toggleButton(gpioID):
     #print(gpioID)
-    objBtn = dictionaryPinsTkinter[str(gpioID)]
     objPin = dictionaryPins[str(gpioID)]
     
     if(objPin.In == "1"):
         objPin.In = "0"
     elif(objPin.In == "0"):
         objPin.In = "1"
-        
-    objBtn["text"] = "GPIO" + str(gpioID) + "\nIN=" + str(objPin.In)
+
+    #clicks arrive on the Tk thread, so the button can be redrawn right away
+    drawGPIOPin(str(gpioID))
+
+    fireEdgeCallbacks(int(gpioID), objPin.In == "1")
+
+
+def fireEdgeCallbacks(channel, rising):
+    #run the callbacks registered with add_event_detect, like RPi.GPIO does
+    if channel not in GPIO.events:
+        return
+    edge, callbacks = GPIO.events[channel]
+    if(edge == GPIO.BOTH or edge == (GPIO.RISING if rising else GPIO.FALLING)):
+        for callback in callbacks:
+            callback(channel)
     
     
   
@@ -304,29 +332,56 @@ def buttonClickRelease(self):
 
 
     
-def drawGPIOOut(gpioID):
-    global dictionaryPins
-    global dictionaryPinsTkinter
-
-    gpioID = str(gpioID)
+def markDirty(mask):
+    #called from any thread; the next frame redraws these pins
+    global dirtyMask
+    with dirtyLock:
+        dirtyMask |= mask
+
+
+def drawDirtyPins():
+    #Tk thread only: redraw the pins changed since the last frame
+    global dirtyMask
+    with dirtyLock:
+        mask = dirtyMask
+        dirtyMask = 0
+    while mask:
+        low = mask & -mask
+        mask ^= low
+        drawGPIOPin(str(low.bit_length() - 1))
+
+
+def drawGPIOPin(gpioID):
+    #Tk thread only
     objPin = dictionaryPins[gpioID]
     objBtn = dictionaryPinsTkinter[gpioID]
 
-    
-
     if(objPin.SetMode == "OUT"):
-        objBtn["text"] = "GPIO" + str(gpioID) + "\nOUT=" + str(objPin.Out)
+        drawn = ("OUT", objPin.Out)
+        if(drawnPins.get(gpioID) == drawn):
+            return
+        objBtn["text"] = "GPIO" + gpioID + "\nOUT=" + str(objPin.Out)
         if(str(objPin.Out) == "1"):
             objBtn.configure(background='tan2')
             objBtn.configure(activebackground='tan2')
         else:
             objBtn.configure(background='DarkOliveGreen3')
             objBtn.configure(activebackground='DarkOliveGreen3')
-            
-            
-    
-    
-    
+
+    elif(objPin.SetMode == "IN"):
+        drawn = ("IN", objPin.In)
+        if(drawnPins.get(gpioID) == drawn):
+            return
+        if(gpioID not in drawnPins):
+            drawBindUpdateButtonIn(gpioID, objPin.In)
+        else:
+            objBtn["text"] = "GPIO" + gpioID + "\nIN=" + str(objPin.In)
+
+    else:
+        return
+
+    drawnPins[gpioID] = drawn
+
 
 def drawBindUpdateButtonIn(gpioID,In):
     objBtn = dictionaryPinsTkinter[gpioID]
@@ -351,10 +406,16 @@ class GPIO:
     PUD_DOWN = 5
     PUD_UP = 6
     BCM = 7
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
 
     #flags
     setModeDone = False
 
+    #channel -> [edge, callbacks] for pins with event detection
+    events = {}
+
     #Extra functions
     def checkModeValidator():
         if(GPIO.setModeDone == False):
@@ -394,7 +455,7 @@ class GPIO:
                 objTemp.Out = "1"
                 
             dictionaryPins[str(channel)] =objTemp
-            drawGPIOOut(channel)
+            markDirty(1 << channel)
             
         elif(state == GPIO.IN):
             #set input
@@ -410,8 +471,8 @@ class GPIO:
                 objTemp.pull_up_down = "PUD_UP"
                 objTemp.In = "1"
                 
-            drawBindUpdateButtonIn(str(channel),objTemp.In)
             dictionaryPins[str(channel)] =objTemp
+            markDirty(1 << channel)
             
             
         
@@ -446,7 +507,41 @@ class GPIO:
             objPin.Out = "1"
 
         
-        drawGPIOOut(channel)
+        markDirty(1 << int(channel))
+
+
+    @typeassert(int,int)
+    def output_bank(set_mask, clear_mask):
+        global dictionaryPins
+
+        GPIO.checkModeValidator()
+
+        if(set_mask & clear_mask):
+            raise Exception('A pin cannot be both set and cleared')
+
+        if((set_mask | clear_mask) & ~GPIOMask):
+            raise Exception('GPIO must be setup before used')
+
+        #validate every pin before changing any, so the bank switches as one
+        changes = []
+        for gpioID in GPIONames:
+            bit = 1 << int(gpioID)
+            if(set_mask & bit):
+                changes.append((gpioID, "1"))
+            elif(clear_mask & bit):
+                changes.append((gpioID, "0"))
+            else:
+                continue
+
+            if gpioID not in dictionaryPins:
+                raise Exception('GPIO must be setup before used')
+            if(dictionaryPins[gpioID].SetMode == "IN"):
+                raise Exception('GPIO must be setup as OUT')
+
+        for gpioID, out in changes:
+            dictionaryPins[gpioID].Out = out
+
+        markDirty(set_mask | clear_mask)
 
 
     @typeassert(int)
@@ -474,6 +569,25 @@ class GPIO:
 
 
     
+    @typeassert(int,int)
+    def add_event_detect(channel, edge, callback=None, bouncetime=-1):
+        channel_name = str(channel)
+        if channel_name not in dictionaryPins or dictionaryPins[channel_name].SetMode != "IN":
+            raise Exception('GPIO must be setup as IN')
+        if channel in GPIO.events:
+            raise Exception('Edge detection already enabled for this GPIO channel')
+        GPIO.events[channel] = [edge, [callback] if callback else []]
+
+    @typeassert(int)
+    def add_event_callback(channel, callback):
+        if channel not in GPIO.events:
+            raise Exception('Add event detection using add_event_detect first')
+        GPIO.events[channel][1].append(callback)
+
+    @typeassert(int)
+    def remove_event_detect(channel):
+        GPIO.events.pop(channel, None)
+
     def cleanup():
         pass
        
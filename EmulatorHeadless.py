@@ -0,0 +1,189 @@
+"""Headless GPIO emulator with the same API as EmulatorGUI.GPIO.
+
+No display, no Tk thread and no artificial sleeps: pin modes and levels
+live in two bytearrays indexed by BCM number, so output() is a couple of
+array operations. Transition recording is off by default:
+
+    from EmulatorHeadless import GPIO
+    GPIO.record(True)
+    ...
+    for t_ns, pin, level in GPIO.transitions: ...
+"""
+
+import time
+
+GPIO_PINS = (2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19,
+             20, 21, 22, 23, 24, 25, 26, 27)
+
+# pin modes stored in _modes
+_UNSET = 0
+_OUT = 2
+_IN = 3
+
+_modes = bytearray(max(GPIO_PINS) + 1)
+_levels = bytearray(max(GPIO_PINS) + 1)
+
+
+def _check_setup(channel):
+    if channel not in GPIO_PINS:
+        raise Exception('GPIO ' + str(channel) + ' does not exist')
+    if not GPIO.setModeDone:
+        raise Exception('Setup your GPIO mode. Must be set to BCM')
+
+
+def _output_error(channel, outmode):
+    # Only reached when output() sees something unusual, to keep it short
+    for name, value in (("channel", channel), ("outmode", outmode)):
+        if not isinstance(value, int):
+            raise TypeError('Argument {} must be {}'.format(name, int))
+    GPIO.checkModeValidator()
+    if channel not in GPIO_PINS or _modes[channel] == _UNSET:
+        raise Exception('GPIO must be setup before used')
+    if _modes[channel] == _IN:
+        raise Exception('GPIO must be setup as OUT')
+    raise Exception('Output must be set to HIGH/LOW')
+
+
+class GPIO:
+
+    # constants
+    LOW = 0
+    HIGH = 1
+    OUT = 2
+    IN = 3
+    PUD_OFF = 4
+    PUD_DOWN = 5
+    PUD_UP = 6
+    BCM = 7
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+
+    # flags
+    setModeDone = False
+    recording = False
+
+    # (time.monotonic_ns(), channel, level) per level change while recording
+    transitions = []
+
+    # channel -> [edge, callbacks] for pins with event detection
+    events = {}
+
+    # Extra functions
+    def checkModeValidator():
+        if GPIO.setModeDone == False:
+            raise Exception('Setup your GPIO mode. Must be set to BCM')
+
+    def record(flag=True):
+        """Start (or stop) recording output transitions"""
+        GPIO.recording = flag
+
+    def set_input(channel, level):
+        """Drive an input pin as if the outside world changed it.
+
+        Edge callbacks run right away, in the caller's thread.
+        """
+        if _modes[channel] != _IN:
+            raise Exception('GPIO must be setup as IN')
+        level = 1 if level else 0
+        if _levels[channel] == level:
+            return
+        _levels[channel] = level
+
+        if channel in GPIO.events:
+            edge, callbacks = GPIO.events[channel]
+            if edge == GPIO.BOTH or edge == (GPIO.RISING if level else GPIO.FALLING):
+                for callback in callbacks:
+                    callback(channel)
+
+    # GPIO LIBRARY Functions
+    def setmode(mode):
+        if not isinstance(mode, int):
+            raise TypeError('Argument mode must be {}'.format(int))
+        GPIO.setModeDone = mode == GPIO.BCM
+
+    def setwarnings(flag):
+        pass
+
+    def setup(channel, state, initial=-1, pull_up_down=-1):
+        _check_setup(channel)
+
+        # check if channel is already setup
+        if _modes[channel] != _UNSET:
+            raise Exception('GPIO is already setup')
+
+        if state == GPIO.OUT:
+            _modes[channel] = _OUT
+            _levels[channel] = 1 if initial == GPIO.HIGH else 0
+        elif state == GPIO.IN:
+            _modes[channel] = _IN
+            _levels[channel] = 1 if pull_up_down == GPIO.PUD_UP else 0
+
+    def output(channel, outmode):
+        try:
+            ok = (
+                channel >= 0
+                and _modes[channel] == _OUT
+                and (outmode == 0 or outmode == 1)
+            )
+        except (TypeError, IndexError):
+            ok = False
+        if not ok or outmode.__class__ is float:
+            _output_error(channel, outmode)
+        if GPIO.recording and _levels[channel] != outmode:
+            GPIO.transitions.append((time.monotonic_ns(), channel, outmode))
+        _levels[channel] = outmode
+
+    def output_bank(set_mask, clear_mask):
+        """Drive every pin in set_mask HIGH and every pin in clear_mask LOW"""
+        if set_mask & clear_mask:
+            raise Exception('A pin cannot be both set and cleared')
+
+        # Validate the whole bank first so a bad pin changes nothing
+        changes = []
+        for level, mask in ((1, set_mask), (0, clear_mask)):
+            while mask:
+                low = mask & -mask
+                mask ^= low
+                channel = low.bit_length() - 1
+                if channel >= len(_modes) or _modes[channel] != _OUT:
+                    _output_error(channel, level)
+                changes.append((channel, level))
+
+        if GPIO.recording:
+            now = time.monotonic_ns()
+            for channel, level in changes:
+                if _levels[channel] != level:
+                    GPIO.transitions.append((now, channel, level))
+        for channel, level in changes:
+            _levels[channel] = level
+
+    def input(channel):
+        GPIO.checkModeValidator()
+        if channel not in GPIO_PINS or _modes[channel] == _UNSET:
+            raise Exception('GPIO must be setup before used')
+        if _modes[channel] == _OUT:
+            raise Exception('GPIO must be setup as IN')
+        return _levels[channel] == 1
+
+    def add_event_detect(channel, edge, callback=None, bouncetime=-1):
+        if _modes[channel] != _IN:
+            raise Exception('GPIO must be setup as IN')
+        if channel in GPIO.events:
+            raise Exception('Edge detection already enabled for this GPIO channel')
+        GPIO.events[channel] = [edge, [callback] if callback else []]
+
+    def add_event_callback(channel, callback):
+        if channel not in GPIO.events:
+            raise Exception('Add event detection using add_event_detect first')
+        GPIO.events[channel][1].append(callback)
+
+    def remove_event_detect(channel):
+        GPIO.events.pop(channel, None)
+
+    def cleanup():
+        # Unlike the GUI emulator, release every pin so a run can start over
+        for pin in GPIO_PINS:
+            _modes[pin] = _UNSET
+            _levels[pin] = 0
+        GPIO.events.clear()
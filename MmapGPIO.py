@@ -0,0 +1,225 @@
+"""GPIO backend that writes the BCM283x/BCM2711 GPIO registers directly.
+
+The register block is memory-mapped from /dev/gpiomem (no root needed for
+users in the gpio group) and pins are driven through the GPSET/GPCLR
+registers, so output_bank() changes every pin of a 32-pin bank with one
+store. The API matches RPi.GPIO and EmulatorGUI.GPIO:
+
+    from MmapGPIO import GPIO
+
+For testing on any Linux box, point it at a plain file laid out like the
+register block instead:
+
+    GPIO.DEVICE = "gpio_regs.bin"    # created and zero-filled if missing
+
+Writes then land in the file, where read_register() can check them.
+Input pull-ups/downs use the BCM2711 (Pi 4) pull registers.
+"""
+
+import mmap
+import os
+
+BLOCK_SIZE = 4096
+
+# Register offsets in bytes from the start of the GPIO block
+GPFSEL0 = 0x00
+GPSET0 = 0x1C
+GPCLR0 = 0x28
+GPLEV0 = 0x34
+GPIO_PUP_PDN_CNTRL_REG0 = 0xE4
+
+GPIO_PINS = (2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19,
+             20, 21, 22, 23, 24, 25, 26, 27)
+
+# register indexes (in 32-bit words) used on the hot path
+_SET = GPSET0 // 4
+_CLR = GPCLR0 // 4
+_LEV = GPLEV0 // 4
+
+# pin modes, tracked in software so misuse raises like the emulators do
+_UNSET = 0
+_OUT = 2
+_IN = 3
+
+_modes = bytearray(max(GPIO_PINS) + 1)
+_VALID_MASK = sum(1 << pin for pin in GPIO_PINS)
+
+
+def create_register_file(path):
+    """Create a zero-filled file the size of the GPIO register block"""
+    with open(path, "wb") as f:
+        f.write(bytes(BLOCK_SIZE))
+
+
+def _check_mask(set_mask, clear_mask):
+    if set_mask & clear_mask:
+        raise Exception('A pin cannot be both set and cleared')
+    mask = set_mask | clear_mask
+    if mask & ~GPIO._out_mask == 0:
+        return
+    if mask & ~_VALID_MASK:
+        raise Exception('GPIO must be setup before used')
+    while mask:
+        low = mask & -mask
+        mask ^= low
+        _check_output(low.bit_length() - 1)
+
+
+def _check_output(channel):
+    if not isinstance(channel, int):
+        raise TypeError('Argument channel must be {}'.format(int))
+    GPIO.checkModeValidator()
+    if channel not in GPIO_PINS or _modes[channel] == _UNSET:
+        raise Exception('GPIO must be setup before used')
+    if _modes[channel] == _IN:
+        raise Exception('GPIO must be setup as OUT')
+
+
+class GPIO:
+
+    # constants
+    LOW = 0
+    HIGH = 1
+    OUT = 2
+    IN = 3
+    PUD_OFF = 4
+    PUD_DOWN = 5
+    PUD_UP = 6
+    BCM = 7
+
+    DEVICE = "/dev/gpiomem"
+
+    # flags
+    setModeDone = False
+
+    # bitmask of the pins currently set up as outputs
+    _out_mask = 0
+
+    # memory map of the register block and a 32-bit view of it
+    _map = None
+    _regs = None
+
+    # Extra functions
+    def checkModeValidator():
+        if GPIO.setModeDone == False:
+            raise Exception('Setup your GPIO mode. Must be set to BCM')
+
+    def open():
+        if GPIO._map is not None:
+            return
+        if GPIO.DEVICE != "/dev/gpiomem" and not os.path.exists(GPIO.DEVICE):
+            create_register_file(GPIO.DEVICE)
+
+        fd = os.open(GPIO.DEVICE, os.O_RDWR | os.O_SYNC)
+        try:
+            GPIO._map = mmap.mmap(fd, BLOCK_SIZE, mmap.MAP_SHARED,
+                                  mmap.PROT_READ | mmap.PROT_WRITE)
+        finally:
+            os.close(fd)
+        GPIO._regs = memoryview(GPIO._map).cast("I")
+
+    def close():
+        if GPIO._map is None:
+            return
+        GPIO._regs.release()
+        GPIO._map.close()
+        GPIO._regs = None
+        GPIO._map = None
+
+    def read_register(offset):
+        """Current value of the 32-bit register at byte offset"""
+        return GPIO._regs[offset // 4]
+
+    def _set_function(channel, function):
+        index = GPFSEL0 // 4 + channel // 10
+        shift = (channel % 10) * 3
+        regs = GPIO._regs
+        regs[index] = (regs[index] & ~(0b111 << shift)) | (function << shift)
+
+    def _set_pull(channel, pull):
+        index = GPIO_PUP_PDN_CNTRL_REG0 // 4 + channel // 16
+        shift = (channel % 16) * 2
+        regs = GPIO._regs
+        regs[index] = (regs[index] & ~(0b11 << shift)) | (pull << shift)
+
+    # GPIO LIBRARY Functions
+    def setmode(mode):
+        if not isinstance(mode, int):
+            raise TypeError('Argument mode must be {}'.format(int))
+        GPIO.open()
+        GPIO.setModeDone = mode == GPIO.BCM
+
+    def setwarnings(flag):
+        pass
+
+    def setup(channel, state, initial=-1, pull_up_down=-1):
+        GPIO.checkModeValidator()
+
+        if channel not in GPIO_PINS:
+            raise Exception('GPIO ' + str(channel) + ' does not exist')
+
+        # check if channel is already setup
+        if _modes[channel] != _UNSET:
+            raise Exception('GPIO is already setup')
+
+        if state == GPIO.OUT:
+            # Latch the initial level before the pin starts driving
+            if initial == GPIO.HIGH:
+                GPIO._regs[_SET] = 1 << channel
+            else:
+                GPIO._regs[_CLR] = 1 << channel
+            GPIO._set_function(channel, 0b001)
+            _modes[channel] = _OUT
+            GPIO._out_mask |= 1 << channel
+        elif state == GPIO.IN:
+            GPIO._set_function(channel, 0b000)
+            GPIO._out_mask &= ~(1 << channel)
+            if pull_up_down == GPIO.PUD_UP:
+                GPIO._set_pull(channel, 0b01)
+            elif pull_up_down == GPIO.PUD_OFF:
+                GPIO._set_pull(channel, 0b00)
+            else:
+                GPIO._set_pull(channel, 0b10)
+            _modes[channel] = _IN
+
+    def output(channel, outmode):
+        try:
+            ok = channel >= 0 and _modes[channel] == _OUT
+        except (TypeError, IndexError):
+            ok = False
+        if not ok:
+            _check_output(channel)
+        if outmode == 1:
+            GPIO._regs[_SET] = 1 << channel
+        elif outmode == 0:
+            GPIO._regs[_CLR] = 1 << channel
+        else:
+            raise Exception('Output must be set to HIGH/LOW')
+
+    def output_bank(set_mask, clear_mask):
+        """Drive set_mask HIGH and clear_mask LOW with one store each"""
+        _check_mask(set_mask, clear_mask)
+        regs = GPIO._regs
+        if set_mask:
+            regs[_SET] = set_mask
+        if clear_mask:
+            regs[_CLR] = clear_mask
+
+    def input(channel):
+        GPIO.checkModeValidator()
+        if channel not in GPIO_PINS or _modes[channel] == _UNSET:
+            raise Exception('GPIO must be setup before used')
+        if _modes[channel] == _OUT:
+            raise Exception('GPIO must be setup as IN')
+        return bool(GPIO._regs[_LEV] >> channel & 1)
+
+    def cleanup():
+        # Return every pin we touched to a plain input, like RPi.GPIO does
+        if GPIO._regs is not None:
+            for pin in GPIO_PINS:
+                if _modes[pin] != _UNSET:
+                    GPIO._set_function(pin, 0b000)
+                    _modes[pin] = _UNSET
+        GPIO._out_mask = 0
+        GPIO.close()
+        GPIO.setModeDone = False
@@ -0,0 +1,251 @@
+"""GPIO backend for relays on a chain of 74HC595 shift registers.
+
+Channels are the outputs along the chain rather than header pins:
+channel 0 is Q0 of the register nearest the Pi, channel 8 is Q0 of the
+next one, and so on up to CHANNELS - 1, so 8 registers give 64 relays.
+The API matches RPi.GPIO and the emulators, and output_bank() takes the
+same bitmasks (bit n = channel n), so the cue engine drives channels the
+way it drives pins:
+
+    from ShiftGPIO import GPIO
+    GPIO.CHANNELS = 128
+
+Every write sends the whole frame, one bit per channel, as a single
+transfer. By default that is one write() to the SPI device with the
+chain wired as
+
+    MOSI (GPIO10) -> SER of the first register, QH' -> SER of the next
+    SCLK (GPIO11) -> SRCLK of every register
+    CE0  (GPIO8)  -> RCLK of every register
+
+so the outputs latch together when chip select goes high at the end of
+the transfer. BitBangTransport shifts through any three GPIO pins of
+another backend instead, and CaptureTransport models the chain in memory
+for tests and bench_shift_register.py. cleanup() leaves the last frame
+latched, so switch relays off before calling it.
+"""
+
+import fcntl
+import os
+import struct
+
+# linux/spi/spidev.h
+_SPI_IOC_WR_MODE = 0x40016B01
+_SPI_IOC_WR_BITS_PER_WORD = 0x40016B03
+_SPI_IOC_WR_MAX_SPEED_HZ = 0x40046B04
+
+SPI_SPEED_HZ = 8_000_000
+
+
+def frame_bytes(state, channels):
+    """Bytes to shift out for state, farthest register first, MSB (QH) first"""
+    return state.to_bytes((channels + 7) // 8, "big")
+
+
+class SpiTransport:
+    """Shifts frames out of a spidev device, one write() per frame"""
+
+    def __init__(self, device="/dev/spidev0.0", speed_hz=SPI_SPEED_HZ):
+        self.device = device
+        self._fd = os.open(device, os.O_RDWR)
+        try:
+            # Mode 0: data is sampled on the rising SCLK edge, like SRCLK
+            fcntl.ioctl(self._fd, _SPI_IOC_WR_MODE, struct.pack("B", 0))
+            fcntl.ioctl(self._fd, _SPI_IOC_WR_BITS_PER_WORD, struct.pack("B", 8))
+            fcntl.ioctl(self._fd, _SPI_IOC_WR_MAX_SPEED_HZ, struct.pack("I", speed_hz))
+        except OSError:
+            os.close(self._fd)
+            raise
+
+    def write(self, data):
+        os.write(self._fd, data)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class BitBangTransport:
+    """Shifts frames out through three output pins of another GPIO backend"""
+
+    def __init__(self, gpio, data_pin, clock_pin, latch_pin):
+        self.gpio = gpio
+        self.data_pin = data_pin
+        self.clock_pin = clock_pin
+        self.latch_pin = latch_pin
+        gpio.setmode(gpio.BCM)
+        for pin in (data_pin, clock_pin, latch_pin):
+            gpio.setup(pin, gpio.OUT)
+
+    def write(self, data):
+        output = self.gpio.output
+        for byte in data:
+            for shift in range(7, -1, -1):
+                output(self.data_pin, byte >> shift & 1)
+                output(self.clock_pin, 1)
+                output(self.clock_pin, 0)
+        output(self.latch_pin, 1)
+        output(self.latch_pin, 0)
+
+    def close(self):
+        pass
+
+
+class CaptureTransport:
+    """Keeps the frames shifted out and models what the chain latches
+
+    latched() does not use frame_bytes(), so comparing it with the state
+    written checks the order a frame's bits are sent in.
+    """
+
+    def __init__(self, channels=None):
+        # None follows GPIO.CHANNELS
+        self.channels = channels
+        self.frames = 0
+        self.bytes = 0
+        self.last = b""
+        # The bytes still in the chain: only the last one per register
+        self._tail = b""
+
+    def write(self, data):
+        self.frames += 1
+        self.bytes += len(data)
+        self.last = data
+        self._tail = (self._tail + data)[-self._registers():]
+
+    def _registers(self):
+        return (self.channels or GPIO.CHANNELS) + 7 >> 3
+
+    def latched(self):
+        """Channel states (bit n = channel n) the chain would show now
+
+        Every bit is clocked through the registers from an empty chain,
+        and then channel n is read from Q(n % 8) of register n // 8.
+        """
+        registers = [0] * self._registers()
+        for byte in self._tail:
+            for bit in range(7, -1, -1):
+                # SRCLK: each register moves Q0..Q6 up to Q1..Q7 and takes
+                # SER into Q0; SER is QH' of the register before (MOSI first)
+                carry = byte >> bit & 1
+                for r, q in enumerate(registers):
+                    registers[r] = (q << 1 | carry) & 0xFF
+                    carry = q >> 7
+        state = 0
+        for r, q in enumerate(registers):
+            state |= q << 8 * r
+        return state
+
+    def close(self):
+        pass
+
+
+class GPIO:
+
+    # constants
+    LOW = 0
+    HIGH = 1
+    OUT = 2
+    IN = 3
+    PUD_OFF = 4
+    PUD_DOWN = 5
+    PUD_UP = 6
+    BCM = 7
+
+    # Length of the chain in outputs (8 per register)
+    CHANNELS = 64
+
+    # Where frames go; None opens SpiTransport(DEVICE) on setmode()
+    DEVICE = "/dev/spidev0.0"
+    transport = None
+
+    # flags
+    setModeDone = False
+
+    # current output of every channel, and the channels set up as outputs
+    _state = 0
+    _out_mask = 0
+
+    # Extra functions
+    def checkModeValidator():
+        if GPIO.setModeDone == False:
+            raise Exception('Setup your GPIO mode. Must be set to BCM')
+
+    def _send():
+        GPIO.transport.write(frame_bytes(GPIO._state, GPIO.CHANNELS))
+
+    # GPIO LIBRARY Functions
+    def setmode(mode):
+        if not isinstance(mode, int):
+            raise TypeError('Argument mode must be {}'.format(int))
+        if GPIO.transport is None:
+            GPIO.transport = SpiTransport(GPIO.DEVICE)
+        GPIO.setModeDone = mode == GPIO.BCM
+
+    def setwarnings(flag):
+        pass
+
+    def setup(channel, state, initial=-1, pull_up_down=-1):
+        GPIO.checkModeValidator()
+
+        if not 0 <= channel < GPIO.CHANNELS:
+            raise Exception('Channel ' + str(channel) + ' does not exist')
+        if state != GPIO.OUT:
+            raise Exception('Shift register channels are outputs only')
+
+        bit = 1 << channel
+        GPIO._out_mask |= bit
+        if initial == GPIO.HIGH:
+            GPIO._state |= bit
+        else:
+            GPIO._state &= ~bit
+        GPIO._send()
+
+    def output(channel, outmode):
+        if isinstance(channel, (list, tuple)):
+            if not isinstance(outmode, (list, tuple)):
+                outmode = [outmode] * len(channel)
+            set_mask = clear_mask = 0
+            for pin, level in zip(channel, outmode):
+                if level:
+                    set_mask |= 1 << pin
+                else:
+                    clear_mask |= 1 << pin
+            GPIO.output_bank(set_mask, clear_mask)
+            return
+
+        bit = 1 << channel
+        if not GPIO._out_mask & bit:
+            GPIO.checkModeValidator()
+            raise Exception('GPIO must be setup before used')
+        if outmode == 1:
+            GPIO._state |= bit
+        elif outmode == 0:
+            GPIO._state &= ~bit
+        else:
+            raise Exception('Output must be set to HIGH/LOW')
+        GPIO._send()
+
+    def output_bank(set_mask, clear_mask):
+        """Set and clear any channels of the chain in one transfer"""
+        if set_mask & clear_mask:
+            raise Exception('A pin cannot be both set and cleared')
+        if (set_mask | clear_mask) & ~GPIO._out_mask:
+            GPIO.checkModeValidator()
+            raise Exception('GPIO must be setup before used')
+        GPIO._state = (GPIO._state | set_mask) & ~clear_mask
+        GPIO._send()
+
+    def input(channel):
+        raise Exception('Shift register channels are outputs only')
+
+    def cleanup():
+        # The registers hold the last frame latched, whatever the caller
+        # switched off before this; cleanup only lets go of the transport
+        if GPIO.transport is not None:
+            GPIO.transport.close()
+            GPIO.transport = None
+        GPIO._state = 0
+        GPIO._out_mask = 0
+        GPIO.setModeDone = False
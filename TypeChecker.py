@@ -1,6 +1,79 @@
-from inspect import signature
+from inspect import Parameter, signature
 from functools import wraps
 
+# Stands in for arguments the caller left out, so only supplied ones are checked
+_missing = object()
+
+
+def _bind_wrapper(func, sig, bound_types):
+    # Generic version, used when the signature has *args or **kwargs
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        bound_values = sig.bind(*args, **kwargs)
+        # Enforce type assertions across supplied arguments
+        for name, value in bound_values.arguments.items():
+            if name in bound_types:
+                if not isinstance(value, bound_types[name]):
+                  raise TypeError(
+                    'Argument {} must be {}'.format(name, bound_types[name])
+                    )
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def _compiled_wrapper(func, sig, bound_types):
+    # Generate a wrapper with func's own parameter list, so Python does the
+    # argument binding and each check is a single inline isinstance() call
+    namespace = {"_func": func, "_missing": _missing}
+    params = []
+    checks = []
+    call_args = []
+    keyword_only = False
+
+    for i, (name, param) in enumerate(sig.parameters.items()):
+        if param.kind == Parameter.KEYWORD_ONLY and not keyword_only:
+            params.append("*")
+            keyword_only = True
+
+        if param.default is Parameter.empty:
+            params.append(name)
+        else:
+            params.append(name + "=_missing")
+            namespace[f"_d{i}"] = param.default
+        call_args.append(f"{name}={name}" if keyword_only else name)
+
+        if name in bound_types:
+            namespace[f"_t{i}"] = bound_types[name]
+            namespace[f"_m{i}"] = 'Argument {} must be {}'.format(name, bound_types[name])
+            check = f"not isinstance({name}, _t{i})"
+        else:
+            check = None
+
+        if param.default is Parameter.empty:
+            if check:
+                checks.append(f"    if {check}: raise TypeError(_m{i})")
+        else:
+            checks.append(f"    if {name} is _missing: {name} = _d{i}")
+            if check:
+                checks.append(f"    elif {check}: raise TypeError(_m{i})")
+
+    source = "def wrapper({}):\n{}\n    return _func({})\n".format(
+        ", ".join(params), "\n".join(checks) or "    pass", ", ".join(call_args)
+    )
+    exec(compile(source, f"<typeassert {func.__qualname__}>", "exec"), namespace)
+    return wraps(func)(namespace["wrapper"])
+
+
+def _can_compile(sig):
+    for name, param in sig.parameters.items():
+        if param.kind not in (Parameter.POSITIONAL_OR_KEYWORD, Parameter.KEYWORD_ONLY):
+            return False
+        # Names the generated wrapper uses itself
+        if name.startswith("_") or name in ("isinstance", "TypeError"):
+            return False
+    return True
+
+
 def typeassert(*ty_args, **ty_kwargs):
     def decorate(func):
         # If in optimized mode, disable type checking
@@ -11,16 +84,7 @@ def typeassert(*ty_args, **ty_kwargs):
         sig = signature(func)
         bound_types = sig.bind_partial(*ty_args, **ty_kwargs).arguments
 
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            bound_values = sig.bind(*args, **kwargs)
-            # Enforce type assertions across supplied arguments
-            for name, value in bound_values.arguments.items():
-                if name in bound_types:
-                    if not isinstance(value, bound_types[name]):
-                      raise TypeError(
-                        'Argument {} must be {}'.format(name, bound_types[name])
-                        )
-            return func(*args, **kwargs)
-        return wrapper
+        if _can_compile(sig):
+            return _compiled_wrapper(func, sig, bound_types)
+        return _bind_wrapper(func, sig, bound_types)
     return decorate
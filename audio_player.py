@@ -0,0 +1,381 @@
+import ctypes
+import ctypes.util
+import mmap
+import subprocess
+import threading
+import time
+import wave
+
+# ALSA playback device and how much audio it may buffer ahead of the DAC
+ALSA_DEVICE = "default"
+ALSA_LATENCY_US = 50000
+
+# Frames handed to ALSA per write; the playback clock is re-anchored after each
+WRITE_FRAMES = 512
+
+# How long wait_started() waits for the first sample before giving up
+START_TIMEOUT = 2.0
+
+_SND_PCM_STREAM_PLAYBACK = 0
+_SND_PCM_ACCESS_RW_INTERLEAVED = 3
+
+# WAV sample width in bytes -> snd_pcm_format_t
+_SND_PCM_FORMATS = {
+    1: 1,  # SND_PCM_FORMAT_U8
+    2: 2,  # SND_PCM_FORMAT_S16_LE
+    3: 32,  # SND_PCM_FORMAT_S24_3LE
+    4: 10,  # SND_PCM_FORMAT_S32_LE
+}
+
+
+def _load_libasound():
+    name = ctypes.util.find_library("asound")
+    if name is None:
+        return None
+    try:
+        lib = ctypes.CDLL(name)
+    except OSError:
+        return None
+
+    c_void_p = ctypes.c_void_p
+    lib.snd_pcm_open.argtypes = [
+        ctypes.POINTER(c_void_p),
+        ctypes.c_char_p,
+        ctypes.c_int,
+        ctypes.c_int,
+    ]
+    lib.snd_pcm_set_params.argtypes = [
+        c_void_p,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.c_uint,
+        ctypes.c_uint,
+        ctypes.c_int,
+        ctypes.c_uint,
+    ]
+    lib.snd_pcm_writei.argtypes = [c_void_p, c_void_p, ctypes.c_ulong]
+    lib.snd_pcm_writei.restype = ctypes.c_long
+    lib.snd_pcm_delay.argtypes = [c_void_p, ctypes.POINTER(ctypes.c_long)]
+    lib.snd_pcm_prepare.argtypes = [c_void_p]
+    lib.snd_pcm_recover.argtypes = [c_void_p, ctypes.c_int, ctypes.c_int]
+    lib.snd_pcm_drain.argtypes = [c_void_p]
+    lib.snd_pcm_drop.argtypes = [c_void_p]
+    lib.snd_pcm_close.argtypes = [c_void_p]
+    lib.snd_strerror.argtypes = [ctypes.c_int]
+    lib.snd_strerror.restype = ctypes.c_char_p
+    return lib
+
+
+def _pcm_layout(path):
+    """Return (data offset, data size, wave params) for the WAV at path"""
+    with wave.open(path, "rb") as wav:
+        params = wav.getparams()
+    with open(path, "rb") as f:
+        header = f.read(12)
+        if header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            raise ValueError(f"{path} is not a RIFF/WAVE file")
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                raise ValueError(f"{path} has no data chunk")
+            name = chunk[:4]
+            size = int.from_bytes(chunk[4:], "little")
+            if name == b"data":
+                return f.tell(), size, params
+            # chunks are padded to an even length
+            f.seek(size + (size & 1), 1)
+
+
+class AlsaPlayer:
+    """Long-lived in-process WAV player that exposes the DAC position as a clock.
+
+    open() maps the WAV's PCM data and opens the ALSA device once; play()
+    then starts a playthrough on the already-running playback thread, so a
+    show restarts in milliseconds without a process spawn or SD card read.
+    Blocks are written to ALSA straight out of the mapping.
+
+    After every write the player asks ALSA how many frames are still queued
+    (snd_pcm_delay), so frames_written - delay is the number of frames that
+    have actually been played. position() interpolates from the most recent
+    of those readings with time.monotonic().
+    """
+
+    clock_source = "alsa"
+
+    def __init__(self, path, device=ALSA_DEVICE, latency_us=ALSA_LATENCY_US):
+        self._lib = _load_libasound()
+        if self._lib is None:
+            raise OSError("libasound is not available")
+        self.path = path
+        self.device = device
+        self.latency_us = latency_us
+        # Seconds from play() to the first sample leaving the buffer
+        self.start_latency = None
+
+        self._pcm = None
+        self._map = None
+        self._base = None
+        self._thread = None
+        self._closing = False
+        self._stopping = False
+        self._on_block = None
+        self._play_requested = threading.Event()
+        self._started = threading.Event()
+        self._done = threading.Event()
+        self._done.set()
+        self._play_time = 0.0
+        # (monotonic time of the reading, seconds of audio played by then)
+        self._anchor = (0.0, 0.0)
+
+    def _check(self, err, what):
+        if err < 0:
+            message = self._lib.snd_strerror(err).decode()
+            raise OSError(f"{what} failed: {message}")
+
+    def open(self):
+        if self._pcm is not None:
+            return
+        offset, size, params = _pcm_layout(self.path)
+        if params.sampwidth not in _SND_PCM_FORMATS:
+            raise ValueError(f"Unsupported sample width: {params.sampwidth} bytes")
+
+        pcm = ctypes.c_void_p()
+        self._check(
+            self._lib.snd_pcm_open(
+                ctypes.byref(pcm), self.device.encode(), _SND_PCM_STREAM_PLAYBACK, 0
+            ),
+            "snd_pcm_open",
+        )
+        try:
+            self._check(
+                self._lib.snd_pcm_set_params(
+                    pcm,
+                    _SND_PCM_FORMATS[params.sampwidth],
+                    _SND_PCM_ACCESS_RW_INTERLEAVED,
+                    params.nchannels,
+                    params.framerate,
+                    1,
+                    self.latency_us,
+                ),
+                "snd_pcm_set_params",
+            )
+            # A copy-on-write mapping is never written, but unlike a read-only
+            # one ctypes can take its address
+            with open(self.path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        except (OSError, ValueError):
+            self._lib.snd_pcm_close(pcm)
+            raise
+        self._base = ctypes.c_char.from_buffer(self._map)
+
+        self.rate = params.framerate
+        self.sample_width = params.sampwidth
+        self.frame_size = params.nchannels * params.sampwidth
+        self.data_offset = offset
+        self.frames = min(size, len(self._map) - offset) // self.frame_size
+        self.duration = self.frames / self.rate
+
+        self._pcm = pcm
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def play(self, on_block=None):
+        """Start a playthrough from the beginning.
+
+        on_block, if given, is called from the playback thread with every
+        block before it is written, as on_block(data, start, duration,
+        sample_width), so analysis shares the one read of the audio.
+        """
+        self.open()
+        self.stop()
+        self._on_block = on_block
+        self._stopping = False
+        self._started.clear()
+        self._done.clear()
+        self._anchor = (time.monotonic(), 0.0)
+        self._play_time = time.monotonic()
+        self._play_requested.set()
+
+    def _run(self):
+        pcm = self._pcm
+        while True:
+            self._play_requested.wait()
+            self._play_requested.clear()
+            if self._closing:
+                break
+            try:
+                self._play_once()
+            except Exception as e:
+                # Stay alive for the next show; this one's cues carry on
+                # against the wall clock from play()
+                print(f"Audio playback failed: {e}")
+            finally:
+                self._started.set()
+                self._done.set()
+
+        self._lib.snd_pcm_close(pcm)
+
+    def _play_once(self):
+        lib = self._lib
+        pcm = self._pcm
+        rate = self.rate
+        frame_size = self.frame_size
+        base = ctypes.addressof(self._base) + self.data_offset
+        view = memoryview(self._map)[self.data_offset :]
+        on_block = self._on_block
+        delay = ctypes.c_long()
+        written = 0
+
+        self._check(lib.snd_pcm_prepare(pcm), "snd_pcm_prepare")
+        try:
+            while written < self.frames and not self._stopping:
+                frames = min(WRITE_FRAMES, self.frames - written)
+                end = written + frames
+                if on_block is not None:
+                    block = view[written * frame_size : end * frame_size]
+                    on_block(block, written / rate, frames / rate, self.sample_width)
+
+                while written < end and not self._stopping:
+                    address = base + written * frame_size
+                    n = lib.snd_pcm_writei(pcm, address, end - written)
+                    if n < 0:
+                        # Recover from underruns instead of aborting the show
+                        err = lib.snd_pcm_recover(pcm, n, 1)
+                        self._check(err, "snd_pcm_writei")
+                        continue
+                    written += n
+
+                if lib.snd_pcm_delay(pcm, ctypes.byref(delay)) == 0:
+                    played = written - delay.value
+                    if played > 0:
+                        now = time.monotonic()
+                        self._anchor = (now, played / rate)
+                        if not self._started.is_set():
+                            first_sample = now - played / rate
+                            self.start_latency = first_sample - self._play_time
+                            self._started.set()
+
+            if self._stopping:
+                lib.snd_pcm_drop(pcm)
+            else:
+                lib.snd_pcm_drain(pcm)
+        finally:
+            view.release()
+
+    def wait_started(self, timeout=START_TIMEOUT):
+        """Block until the first sample has left the ALSA buffer"""
+        return self._started.wait(timeout)
+
+    def position(self):
+        """Seconds of audio played so far"""
+        anchor_time, played = self._anchor
+        if not self._started.is_set():
+            return played
+        return played + (time.monotonic() - anchor_time)
+
+    def is_playing(self):
+        return not self._done.is_set()
+
+    def worker_id(self):
+        """Native id of the thread feeding ALSA, or None"""
+        return self._thread.native_id if self._thread is not None else None
+
+    def wait(self):
+        self._done.wait()
+
+    def stop(self):
+        if self.is_playing():
+            print("Stopping audio...")
+            self._stopping = True
+            self._done.wait(timeout=1)
+
+    def close(self):
+        """Stop playback and release the device and the mapping"""
+        if self._thread is None:
+            return
+        self.stop()
+        self._closing = True
+        self._play_requested.set()
+        self._thread.join(timeout=1)
+        still_running = self._thread.is_alive()
+        self._thread = None
+        self._pcm = None
+        # Drop the ctypes export before closing the mapping
+        self._base = None
+        if still_running:
+            # Stuck in ALSA: the thread closes the device when it gets out,
+            # and its views keep the mapping alive until then
+            print("Audio thread did not stop in time; leaving the WAV mapped")
+        else:
+            self._map.close()
+        self._map = None
+
+
+class AplayPlayer:
+    """Fallback player: runs aplay and uses a wall clock started after spawn"""
+
+    clock_source = "wall"
+    start_latency = None
+
+    def __init__(self, path):
+        self.path = path
+        self._proc = None
+        self._start_time = 0.0
+
+    def open(self):
+        pass
+
+    def play(self, on_block=None):
+        if on_block is not None:
+            raise OSError("aplay cannot share audio blocks")
+        self.stop()
+        self._proc = subprocess.Popen(
+            ["aplay", self.path],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        self._start_time = time.monotonic()
+
+    def wait_started(self, timeout=START_TIMEOUT):
+        return True
+
+    def position(self):
+        return time.monotonic() - self._start_time
+
+    def is_playing(self):
+        return self._proc is not None and self._proc.poll() is None
+
+    def worker_id(self):
+        """Pid of the running aplay, or None"""
+        return self._proc.pid if self.is_playing() else None
+
+    def wait(self):
+        if self._proc is not None:
+            self._proc.wait()
+
+    def stop(self):
+        if self.is_playing():
+            print("Stopping audio...")
+            self._proc.terminate()
+            try:
+                self._proc.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+
+    def close(self):
+        self.stop()
+
+
+def open_player(path, audio_clock=True):
+    """Open a player for path, preferring the in-process ALSA clock over aplay"""
+    if audio_clock:
+        try:
+            player = AlsaPlayer(path)
+            player.open()
+            return player
+        except (OSError, ValueError, wave.Error, EOFError) as e:
+            # aplay plays files that wave cannot parse, or ALSA cannot take as is
+            print(f"Audio clock unavailable ({e}), falling back to aplay")
+
+    return AplayPlayer(path)
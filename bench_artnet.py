@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""Art-Net backend check on one machine.
+
+Starts an ArtNetReceiver on 127.0.0.1, points ArtNetGPIO at it and plays
+random bank writes across the channels of a few universes, timed by the
+cue scheduler. It then checks what arrived:
+
+- every write shows up as a frame with exactly the levels it set
+- the writes go through TracedGPIO, like main.py's, and the trace holds
+  every channel written, up to the last slot of the last universe
+- write-to-receive latency
+- sequence numbers run without gaps
+- the refresh keeps the largest gap between frames of a universe near
+  1 / REFRESH_HZ
+
+    python bench_artnet.py --universes 2 --writes 500 --duration 5
+"""
+
+import argparse
+import random
+import sys
+import time
+
+import ArtNetGPIO
+from ArtNetGPIO import GPIO, SLOTS, ArtNetReceiver
+from bench_cues import percentile
+from cue_scheduler import run_timeline
+from gpio_bank import mask_pins
+from gpio_trace import TraceRecorder, TracedGPIO
+
+# Longest wait for a write's frame to arrive before it counts as missing
+DELIVERY_TIMEOUT = 0.05
+
+
+def random_writes(channels, count, duration, seed=0):
+    # (time, set_mask, clear_mask), each changing a handful of channels
+    rng = random.Random(seed)
+    writes = []
+    for _ in range(count):
+        set_mask = clear_mask = 0
+        for channel in rng.sample(range(channels), 8):
+            if rng.random() < 0.5:
+                set_mask |= 1 << channel
+            else:
+                clear_mask |= 1 << channel
+        writes.append((rng.uniform(0, duration), set_mask, clear_mask))
+    writes.sort()
+    return writes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--universes", type=int, default=2)
+    parser.add_argument("--writes", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--port", type=int, default=16454)
+    args = parser.parse_args()
+
+    channels = args.universes * SLOTS
+    receiver = ArtNetReceiver("127.0.0.1", args.port)
+    GPIO.TARGET = ("127.0.0.1", args.port)
+    GPIO.UNIVERSES = args.universes
+    GPIO.setmode(GPIO.BCM)
+    for channel in range(channels):
+        GPIO.setup(channel, GPIO.OUT)
+
+    writes = random_writes(channels, args.writes, args.duration)
+    # End on the slots either side of each universe boundary and the very
+    # last one, which do not fit a byte-wide pin number
+    edges = {SLOTS - 1, channels - 1} | {u * SLOTS for u in range(1, args.universes)}
+    writes.append((args.duration, sum(1 << channel for channel in edges), 0))
+    recorder = TraceRecorder()
+    traced = TracedGPIO(GPIO, recorder)
+    levels = [bytearray(SLOTS) for _ in range(args.universes)]
+    # (monotonic time of the write, universe, levels it should leave behind)
+    expected = []
+
+    def fire(i):
+        _, set_mask, clear_mask = writes[i]
+        sent = time.monotonic()
+        traced.output_bank(set_mask, clear_mask)
+        touched = set()
+        for mask, level in ((set_mask, GPIO.LEVEL_ON), (clear_mask, 0)):
+            for channel in mask_pins(mask):
+                u, slot = divmod(channel, SLOTS)
+                levels[u][slot] = level
+                touched.add(u)
+        for u in sorted(touched):
+            expected.append((sent, u, bytes(levels[u])))
+
+    run_timeline([t for t, _, _ in writes], fire)
+    time.sleep(0.2)
+    GPIO.cleanup()
+    time.sleep(0.05)
+    receiver.close()
+
+    frames = {u: [] for u in range(args.universes)}
+    for received, universe, sequence, data in receiver.frames:
+        frames.setdefault(universe - GPIO.FIRST_UNIVERSE, []).append((received, sequence, data))
+
+    latencies = []
+    missing = 0
+    for sent, u, data in expected:
+        arrival = next(
+            (received for received, _, frame in frames[u]
+             if sent <= received <= sent + DELIVERY_TIMEOUT and frame == data),
+            None,
+        )
+        if arrival is None:
+            missing += 1
+        else:
+            latencies.append((arrival - sent) * 1000)
+
+    sequence_errors = 0
+    gaps = []
+    for u, received in frames.items():
+        for (t0, s0, _), (t1, s1, _) in zip(received, received[1:]):
+            if s1 != s0 % 255 + 1:
+                sequence_errors += 1
+            gaps.append((t1 - t0) * 1000)
+
+    traced_pins = {pin for _, pin, level in recorder.events() if level}
+    expected_pins = set()
+    for _, set_mask, _ in writes:
+        expected_pins.update(mask_pins(set_mask))
+    trace_errors = len(traced_pins ^ expected_pins) + (recorder.total > recorder.capacity)
+
+    latencies.sort()
+    gaps.sort()
+    total = sum(len(received) for received in frames.values())
+    print(f"universes           {args.universes:>8d} ({channels} channels)")
+    print(f"writes              {len(writes):>8d} over {args.duration:g} s "
+          f"({len(expected)} universe frames expected)")
+    print(f"frames received     {total:>8d} ({total / args.universes / args.duration:.1f}/s per universe, "
+          f"refresh {ArtNetGPIO.REFRESH_HZ} Hz)")
+    print(f"bad packets         {receiver.bad_packets:>8d}")
+    print(f"send errors         {GPIO.send_errors:>8d}")
+    print(f"sequence errors     {sequence_errors:>8d}")
+    print(f"missing/wrong       {missing:>8d}")
+    print(f"trace errors        {trace_errors:>8d} ({recorder.total} events, "
+          f"highest channel {max(traced_pins, default=0)})")
+    print(f"write to receive    p50 {percentile(latencies, 50):7.3f} ms"
+          f"   p99 {percentile(latencies, 99):7.3f} ms   max {max(latencies, default=0):7.3f} ms")
+    print(f"gap between frames  p50 {percentile(gaps, 50):7.3f} ms"
+          f"   max {max(gaps, default=0):7.3f} ms")
+    sys.exit(1 if missing or sequence_errors or receiver.bad_packets or GPIO.send_errors or trace_errors else 0)
+
+
+if __name__ == "__main__":
+    main()
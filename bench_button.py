@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Press-to-action latency of button_events on the headless emulator.
+
+Simulates presses with bouncing contacts on EmulatorHeadless.GPIO and
+measures the time from the first edge to the on_press callback, plus the
+time from the last bounce (when the contact is actually settled).
+
+    python bench_button.py --presses 200 --bounces 5
+"""
+
+import argparse
+import random
+import threading
+import time
+
+from button_events import DEBOUNCE, Button, InputEvents
+from EmulatorHeadless import GPIO
+
+BUTTON_PIN = 18
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--presses", type=int, default=100)
+    parser.add_argument("--bounces", type=int, default=4,
+                        help="extra contact bounces per press and release")
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE)
+    args = parser.parse_args()
+
+    GPIO.setmode(GPIO.BCM)
+    pressed = threading.Event()
+    released = threading.Event()
+    action_at = []
+
+    def on_press(button):
+        action_at.append(time.monotonic())
+        pressed.set()
+
+    inputs = InputEvents(GPIO)
+    button = inputs.add(Button(BUTTON_PIN, on_press=on_press,
+                               on_release=lambda b: released.set(),
+                               debounce=args.debounce))
+    inputs.start()
+
+    rng = random.Random(0)
+    from_edge = []
+    from_settled = []
+    missed = 0
+    for _ in range(args.presses):
+        pressed.clear()
+        released.clear()
+
+        # Button to GND: press pulls the pin LOW, with some bounce first
+        first_edge = time.monotonic()
+        for _ in range(args.bounces):
+            GPIO.set_input(BUTTON_PIN, 0)
+            time.sleep(rng.uniform(0, args.debounce / 4))
+            GPIO.set_input(BUTTON_PIN, 1)
+            time.sleep(rng.uniform(0, args.debounce / 4))
+        GPIO.set_input(BUTTON_PIN, 0)
+        settled = time.monotonic()
+
+        if pressed.wait(1):
+            from_edge.append(action_at[-1] - first_edge)
+            from_settled.append(action_at[-1] - settled)
+        else:
+            missed += 1
+
+        GPIO.set_input(BUTTON_PIN, 1)
+        released.wait(1)
+
+    inputs.stop()
+    GPIO.cleanup()
+
+    from_edge.sort()
+    from_settled.sort()
+    print(f"presses            {args.presses:>8d} ({missed} missed)")
+    print(f"debounce           {args.debounce * 1000:>8.2f} ms")
+    print(f"settle -> action   p50 {from_settled[len(from_settled) // 2] * 1000:7.3f} ms"
+          f"   max {from_settled[-1] * 1000:7.3f} ms")
+    print(f"edge -> action     p50 {from_edge[len(from_edge) // 2] * 1000:7.3f} ms"
+          f"   max {from_edge[-1] * 1000:7.3f} ms")
+    print(f"last press_latency {button.press_latency * 1000:>8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
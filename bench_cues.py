@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""Cue timing benchmark.
+
+Runs execute_light_audio_cues from main.py and only_lights.py against a
+recording GPIO stand-in and reports how close the cues landed to their
+scheduled times. Audio is replaced by a silent player so no sound card is
+needed.
+
+    python bench_cues.py                 # real CUES tables, real time
+    python bench_cues.py --speed 10      # same shows, 10x time-compressed
+    python bench_cues.py --synthetic 20000 --duration 30
+    sudo python bench_cues.py --rt       # with the real-time profile
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import random
+import sys
+import time
+import types
+
+from cue_timeline import compile_cues
+from gpio_bank import mask_pins
+
+
+class RecordingGPIO:
+    """Same API surface as EmulatorGUI.GPIO, recording every output() call"""
+
+    # constants
+    LOW = 0
+    HIGH = 1
+    OUT = 2
+    IN = 3
+    PUD_OFF = 4
+    PUD_DOWN = 5
+    PUD_UP = 6
+    BCM = 7
+
+    # (monotonic time, channel, value) for every output() call and
+    # (monotonic time, set_mask, clear_mask) for every output_bank() call
+    writes = []
+    pins = {}
+
+    def setmode(mode):
+        pass
+
+    def setwarnings(flag):
+        pass
+
+    def setup(channel, state, initial=-1, pull_up_down=-1):
+        RecordingGPIO.pins[channel] = 1 if initial == RecordingGPIO.HIGH else 0
+
+    def output(channel, outmode):
+        RecordingGPIO.writes.append((time.monotonic(), channel, outmode))
+        RecordingGPIO.pins[channel] = outmode
+
+    def output_bank(set_mask, clear_mask):
+        RecordingGPIO.writes.append((time.monotonic(), set_mask, clear_mask))
+        for level, mask in ((1, set_mask), (0, clear_mask)):
+            for channel in mask_pins(mask):
+                RecordingGPIO.pins[channel] = level
+
+    def input(channel):
+        return bool(RecordingGPIO.pins.get(channel, 0))
+
+    def cleanup():
+        pass
+
+    def reset():
+        RecordingGPIO.writes = []
+
+
+class SilentPlayer:
+    """Stands in for audio_player's players; a wall clock with no sound"""
+
+    clock_source = "wall"
+    start_latency = None
+
+    def __init__(self, path, clock=time.monotonic):
+        self.path = path
+        self.clock = clock
+        self.start_time = 0.0
+
+    def open(self):
+        pass
+
+    def play(self, on_block=None):
+        self.start_time = self.clock()
+
+    def wait_started(self, timeout=None):
+        return True
+
+    def position(self):
+        return self.clock() - self.start_time
+
+    def is_playing(self):
+        return False
+
+    def wait(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def install_gpio_stand_in():
+    # main.py and only_lights.py do `import RPi.GPIO as GPIO`
+    rpi = types.ModuleType("RPi")
+    rpi.GPIO = RecordingGPIO
+    sys.modules["RPi"] = rpi
+    sys.modules["RPi.GPIO"] = RecordingGPIO
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def play_async(module):
+    # Shows on the asyncio controller write through its pin owner
+    async with module.relays:
+        return await module.execute_light_audio_cues()
+
+
+def run_show(name, module, cues):
+    module.CUES = cues
+    module.GPIO.setmode(module.GPIO.BCM)
+    for pin in module.RELAY_PINS:
+        module.GPIO.setup(pin, module.GPIO.OUT)
+    module.SETUP_PINS.update(module.RELAY_PINS)
+    RecordingGPIO.reset()
+
+    wall_start = time.monotonic()
+    cpu_start = time.process_time()
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        if asyncio.iscoroutinefunction(module.execute_light_audio_cues):
+            lateness = asyncio.run(play_async(module))
+        else:
+            lateness = module.execute_light_audio_cues()
+    cpu = time.process_time() - cpu_start
+    wall = time.monotonic() - wall_start
+
+    # One write per frame; the last len(timeline) writes are the show and
+    # earlier ones are the reset
+    timeline = compile_cues(cues)
+    times = timeline.times
+    frame_writes = RecordingGPIO.writes[-len(timeline):]
+    first_write = frame_writes[0][0]
+    drift = [
+        (write[0] - first_write) - (frame_time - times[0])
+        for write, frame_time in zip(frame_writes, times)
+    ]
+
+    late_ms = sorted(value * 1000 for value in lateness)
+    print(f"{name}")
+    for line in output.getvalue().splitlines():
+        if line.startswith("Real-time profile: "):
+            print(f"  realtime    {line.split(': ', 1)[1]}")
+    print(f"  cues        {len(cues):>10d}")
+    print(f"  frames      {len(timeline):>10d}")
+    print(f"  show length {timeline.duration():>10.2f} s")
+    print(f"  p50 late    {percentile(late_ms, 50):>10.3f} ms")
+    print(f"  p99 late    {percentile(late_ms, 99):>10.3f} ms")
+    print(f"  max late    {late_ms[-1]:>10.3f} ms")
+    print(f"  end drift   {drift[-1] * 1000:>10.3f} ms")
+    print(f"  max drift   {max(abs(d) for d in drift) * 1000:>10.3f} ms")
+    print(f"  wall time   {wall:>10.2f} s")
+    print(f"  cpu time    {cpu:>10.3f} s ({cpu / wall * 100:.1f}% of wall)")
+
+
+def scaled(cues, speed):
+    return [(cue_time / speed, pin, state) for cue_time, pin, state in cues]
+
+
+def synthetic_cues(pins, count, duration, seed=0):
+    rng = random.Random(seed)
+    return [
+        (rng.uniform(0, duration), rng.choice(pins), rng.random() < 0.5)
+        for _ in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="compress the real CUES tables by this factor")
+    parser.add_argument("--synthetic", type=int, default=10000,
+                        help="number of cues in the synthetic show (0 to skip)")
+    parser.add_argument("--duration", type=float, default=20.0,
+                        help="length of the synthetic show in seconds")
+    parser.add_argument("--skip-real", action="store_true",
+                        help="only run the synthetic show")
+    parser.add_argument("--rt", action="store_true",
+                        help="play the shows under the real-time profile (realtime.py)")
+    args = parser.parse_args()
+
+    install_gpio_stand_in()
+    import main as main_show
+    import only_lights
+
+    main_show.audio_player = SilentPlayer(main_show.AUDIO_FILE)
+    main_show.REALTIME = only_lights.REALTIME = args.rt
+
+    if not args.skip_real:
+        run_show("main.CUES", main_show, scaled(main_show.CUES, args.speed))
+        run_show("only_lights.CUES", only_lights, scaled(only_lights.CUES, args.speed))
+    if args.synthetic:
+        cues = synthetic_cues(only_lights.RELAY_PINS, args.synthetic, args.duration)
+        run_show(f"synthetic ({args.synthetic} cues)", only_lights, cues)
+
+
+if __name__ == "__main__":
+    main()
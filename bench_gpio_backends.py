@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Pin write throughput of the GPIO backends.
+
+Measures output() and output_bank() calls per second for the headless
+emulator and the memory-mapped register backend. Without --device the
+register backend maps a scratch file laid out like the GPIO block, so
+this runs on any Linux box; on a Pi pass --device /dev/gpiomem to time
+the real registers (only the pins in --pins are touched).
+
+    python bench_gpio_backends.py
+    python bench_gpio_backends.py --device /dev/gpiomem --pins 5 6 16 19 26
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from gpio_bank import pin_mask
+
+CALLS = 1_000_000
+
+
+def rate(func, *args):
+    start = time.perf_counter()
+    for _ in range(CALLS // 10):
+        func(*args); func(*args); func(*args); func(*args); func(*args)
+        func(*args); func(*args); func(*args); func(*args); func(*args)
+    return CALLS / (time.perf_counter() - start)
+
+
+def bench(name, gpio, pins):
+    gpio.setmode(gpio.BCM)
+    for pin in pins:
+        gpio.setup(pin, gpio.OUT)
+
+    mask = pin_mask(pins)
+    single = rate(gpio.output, pins[0], gpio.HIGH)
+    bank = rate(gpio.output_bank, mask, 0)
+    gpio.cleanup()
+
+    print(f"{name}")
+    print(f"  output()      {single / 1e6:8.2f} M calls/s ({1e9 / single:7.1f} ns)")
+    print(f"  output_bank() {bank / 1e6:8.2f} M calls/s ({1e9 / bank:7.1f} ns, "
+          f"{len(pins)} pins)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--device", help="register block to map (default: scratch file)")
+    parser.add_argument("--pins", type=int, nargs="+", default=[5, 6, 16, 19, 26])
+    args = parser.parse_args()
+
+    from EmulatorHeadless import GPIO as HeadlessGPIO
+    from MmapGPIO import GPIO as MmapGPIO
+
+    bench("EmulatorHeadless", HeadlessGPIO, args.pins)
+
+    if args.device:
+        MmapGPIO.DEVICE = args.device
+        bench(f"MmapGPIO ({args.device})", MmapGPIO, args.pins)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            MmapGPIO.DEVICE = os.path.join(tmp, "gpio_regs.bin")
+            bench("MmapGPIO (file-backed)", MmapGPIO, args.pins)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Frame throughput of the shift-register backend.
+
+Writes random frames through ShiftGPIO.GPIO.output_bank() for chains of
+64, 128 and 256 channels and reports full frames per second. Without
+--device the frames go to a CaptureTransport, which also checks that the
+bits shifted out are the ones asked for, so this runs anywhere; on a Pi
+pass --device /dev/spidev0.0 to time the real SPI transfers. --bitbang
+adds the same test shifting through three pins of the headless emulator,
+for comparison with SPI.
+
+    python bench_shift_register.py
+    python bench_shift_register.py --device /dev/spidev0.0 --speed-hz 16000000
+"""
+
+import argparse
+import random
+import time
+
+import ShiftGPIO
+from ShiftGPIO import GPIO
+
+FRAMES = 100_000
+
+
+def random_frames(channels, count, seed=0):
+    # (set_mask, clear_mask) pairs changing about a quarter of the channels
+    rng = random.Random(seed)
+    frames = []
+    for _ in range(count):
+        changed = rng.getrandbits(channels) & rng.getrandbits(channels)
+        on = rng.getrandbits(channels)
+        frames.append((changed & on, changed & ~on))
+    return frames
+
+
+def bench(name, channels, transport, frames, check=False):
+    GPIO.CHANNELS = channels
+    GPIO.transport = transport
+    GPIO.setmode(GPIO.BCM)
+    for channel in range(channels):
+        GPIO.setup(channel, GPIO.OUT)
+
+    output_bank = GPIO.output_bank
+    start = time.perf_counter()
+    for set_mask, clear_mask in frames:
+        output_bank(set_mask, clear_mask)
+    elapsed = time.perf_counter() - start
+
+    if check and transport.latched() != GPIO._state:
+        raise SystemExit(f"{name}: shifted-out frame does not match the channel state")
+    GPIO.cleanup()
+
+    rate = len(frames) / elapsed
+    print(f"{name:<28} {channels:4d} ch  {rate / 1000:9.1f} k frames/s "
+          f"({1e6 / rate:7.2f} us/frame, {rate * channels / 1e6:7.1f} M channel updates/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--device", help="spidev device to shift out of (default: capture)")
+    parser.add_argument("--speed-hz", type=int, default=ShiftGPIO.SPI_SPEED_HZ)
+    parser.add_argument("--frames", type=int, default=FRAMES)
+    parser.add_argument("--bitbang", action="store_true",
+                        help="also shift through pins of the headless emulator")
+    parser.add_argument("--channels", type=int, nargs="+", default=[64, 128, 256])
+    args = parser.parse_args()
+
+    for channels in args.channels:
+        frames = random_frames(channels, args.frames)
+        bench("capture", channels, ShiftGPIO.CaptureTransport(), frames, check=True)
+        if args.device:
+            transport = ShiftGPIO.SpiTransport(args.device, args.speed_hz)
+            bench(f"spi {args.device}", channels, transport, frames)
+        if args.bitbang:
+            from EmulatorHeadless import GPIO as HeadlessGPIO
+
+            transport = ShiftGPIO.BitBangTransport(HeadlessGPIO, 10, 11, 8)
+            bench("bit-bang (headless)", channels, transport, frames[:args.frames // 100])
+            HeadlessGPIO.cleanup()
+
+
+if __name__ == "__main__":
+    main()
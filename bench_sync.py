@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""Multi-Pi sync harness on one machine.
+
+Starts a leader and some followers of main.py's show as separate
+processes on 127.0.0.1, each with the headless GPIO emulator and a silent
+player. Every follower gets its own artificial clock offset, so the
+NTP-style exchange has something to find. Each node records when its
+relays switched (on the machine's real monotonic clock), and the harness
+reports the skew between nodes for every relay change and how far off
+each follower's offset estimate was.
+
+    python bench_sync.py --followers 3 --shows 2 --speed 20
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import random
+import subprocess
+import sys
+import time
+import types
+
+from bench_cues import SilentPlayer, percentile, scaled
+
+# Time for followers to collect a few clock samples before the first show
+WARMUP = 3.0
+
+
+def install_headless_gpio():
+    # main.py does `import RPi.GPIO as GPIO`
+    from EmulatorHeadless import GPIO
+
+    rpi = types.ModuleType("RPi")
+    rpi.GPIO = GPIO
+    sys.modules["RPi"] = rpi
+    sys.modules["RPi.GPIO"] = GPIO
+    return GPIO
+
+
+async def run_node(args):
+    import show_sync
+
+    import main as show
+
+    if args.role == "leader":
+        sync = await show_sync.open_leader(args.port, host="127.0.0.1")
+        deadline = time.monotonic() + 10
+        while len(sync.followers) < args.followers and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(WARMUP)
+    else:
+        offset = args.clock_offset
+
+        def clock():
+            return time.monotonic() + offset
+
+        sync = await show_sync.open_follower("127.0.0.1", args.port, clock=clock)
+
+    show.sync = sync
+    async with show.relays:
+        for _ in range(args.shows):
+            if args.role == "leader":
+                await show.run_show()
+            else:
+                await show.run_show(await sync.next_show())
+            await asyncio.sleep(0.5)
+    sync.close()
+
+    # The leader's clock is the real one, so a perfect estimate is -offset
+    return None if args.role == "leader" else sync.offset + args.clock_offset
+
+
+def node_main(args):
+    gpio = install_headless_gpio()
+    import main as show
+
+    show.SYNC_ROLE = args.role
+    show.audio_player = SilentPlayer(show.AUDIO_FILE)
+    show.CUES = scaled(show.CUES, args.speed)
+
+    gpio.setmode(gpio.BCM)
+    for pin in show.RELAY_PINS:
+        gpio.setup(pin, gpio.OUT)
+    gpio.record()
+    with contextlib.redirect_stdout(io.StringIO()):
+        offset_error = asyncio.run(run_node(args))
+    print(json.dumps({"transitions": gpio.transitions, "offset_error": offset_error}))
+
+
+def node_command(args, role, clock_offset=0.0):
+    return [
+        sys.executable, __file__, "--role", role,
+        "--port", str(args.port), "--followers", str(args.followers),
+        "--shows", str(args.shows), "--speed", str(args.speed),
+        "--clock-offset", repr(clock_offset),
+    ]
+
+
+def edge_times(transitions):
+    # (pin, level, n-th such change) -> time, comparable between nodes
+    seen = {}
+    times = {}
+    for t_ns, pin, level in transitions:
+        n = seen.get((pin, level), 0)
+        seen[(pin, level)] = n + 1
+        times[(pin, level, n)] = t_ns / 1e9
+    return times
+
+
+def harness(args):
+    rng = random.Random(0)
+    nodes = [subprocess.Popen(node_command(args, "leader"), stdout=subprocess.PIPE, text=True)]
+    offsets = [rng.uniform(-1000, 1000) for _ in range(args.followers)]
+    for offset in offsets:
+        nodes.append(
+            subprocess.Popen(node_command(args, "follower", offset), stdout=subprocess.PIPE, text=True)
+        )
+    results = [json.loads(node.communicate()[0]) for node in nodes]
+
+    per_node = [edge_times(result["transitions"]) for result in results]
+    common = set(per_node[0]).intersection(*per_node[1:])
+    skews = sorted(
+        (max(times[key] for times in per_node) - min(times[key] for times in per_node)) * 1000
+        for key in common
+    )
+    if args.verbose:
+        for key in sorted(common, key=lambda key: per_node[0][key]):
+            print(key, [round((times[key] - per_node[0][key]) * 1000, 3) for times in per_node])
+    if not skews:
+        raise SystemExit("No relay changes common to every node")
+
+    print(f"nodes               {len(nodes):>8d} (1 leader, {args.followers} followers)")
+    print(f"shows               {args.shows:>8d} at {args.speed}x speed")
+    print(f"relay changes       {len(skews):>8d} compared "
+          f"({max(map(len, per_node)) - len(common)} missing on some node)")
+    for result, offset in zip(results[1:], offsets):
+        print(f"follower offset     {offset:>8.1f} s, "
+              f"estimate off by {result['offset_error'] * 1e6:8.1f} us")
+    print(f"inter-node skew     p50 {percentile(skews, 50):7.3f} ms"
+          f"   p99 {percentile(skews, 99):7.3f} ms   max {skews[-1]:7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--followers", type=int, default=2)
+    parser.add_argument("--shows", type=int, default=2)
+    parser.add_argument("--speed", type=float, default=20.0,
+                        help="compress main.CUES by this factor")
+    parser.add_argument("--port", type=int, default=15005)
+    parser.add_argument("--verbose", action="store_true",
+                        help="print each relay change relative to the leader, per node")
+    parser.add_argument("--role", choices=("leader", "follower"),
+                        help="run as one node (used by the harness itself)")
+    parser.add_argument("--clock-offset", type=float, default=0.0,
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.role:
+        node_main(args)
+    else:
+        harness(args)
+
+
+if __name__ == "__main__":
+    main()
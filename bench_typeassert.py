@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Per-call overhead of TypeChecker.typeassert on GPIO-shaped functions.
+
+Compares the undecorated function, the generic signature-binding wrapper
+(the previous implementation) and the compiled wrapper typeassert now
+builds at decoration time.
+
+    python bench_typeassert.py
+"""
+
+import timeit
+from inspect import signature
+
+import TypeChecker
+from TypeChecker import typeassert
+
+CALLS = 1_000_000
+
+
+def output(channel, outmode):
+    pass
+
+
+def setup(channel, state, initial=-1, pull_up_down=-1):
+    pass
+
+
+def generic(func, *types):
+    sig = signature(func)
+    bound_types = sig.bind_partial(*types).arguments
+    return TypeChecker._bind_wrapper(func, sig, bound_types)
+
+
+def per_call_ns(stmt, namespace):
+    best = min(timeit.repeat(stmt, globals=namespace, number=CALLS, repeat=5))
+    return best / CALLS * 1e9
+
+
+def main():
+    cases = [
+        ("output(6, 1)", output, (int, int)),
+        ("setup(6, 2, initial=0)", setup, (int, int, int, int)),
+    ]
+    for stmt, func, types in cases:
+        bare = per_call_ns(stmt, {func.__name__: func})
+        old = per_call_ns(stmt, {func.__name__: generic(func, *types)})
+        new = per_call_ns(stmt, {func.__name__: typeassert(*types)(func)})
+        print(stmt)
+        print(f"  undecorated  {bare:8.1f} ns/call")
+        print(f"  bind wrapper {old:8.1f} ns/call ({old - bare:7.1f} ns overhead)")
+        print(f"  compiled     {new:8.1f} ns/call ({new - bare:7.1f} ns overhead)")
+        print(f"  overhead cut {(old - bare) / (new - bare):8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Debounced button events from GPIO edge detection.
+
+Edges are reported by the GPIO backend (add_event_detect), so nothing polls
+the pin. Every edge only records a timestamp; one worker thread per
+InputEvents waits until a button has been quiet for its debounce time,
+reads the settled level once and dispatches press, release and long-press
+callbacks from that thread, or from the event loop when InputEvents.run()
+is used as an asyncio task.
+
+    inputs = InputEvents(GPIO)
+    inputs.add(Button(18, on_press=lambda button: print("pressed")))
+    inputs.start()
+"""
+
+import asyncio
+import heapq
+import queue
+import threading
+import time
+
+DEBOUNCE = 0.02
+LONG_PRESS = 1.0
+
+
+class Button:
+    """A push button on one input pin and what to do when it is used.
+
+    Callbacks get the Button; press_latency holds the time from the first
+    edge of the last press to its on_press dispatch.
+    """
+
+    def __init__(self, pin, on_press=None, on_release=None, on_long_press=None,
+                 active_low=True, debounce=DEBOUNCE, long_press=LONG_PRESS):
+        self.pin = pin
+        self.on_press = on_press
+        self.on_release = on_release
+        self.on_long_press = on_long_press
+        self.active_low = active_low
+        self.debounce = debounce
+        self.long_press = long_press
+
+        self.pressed = False
+        self.press_latency = None
+        self._first_edge = None
+        self._settle_at = None
+        self._long_at = None
+
+
+class InputEvents:
+    """Owns the edge detection and the dispatch thread for a set of buttons"""
+
+    def __init__(self, gpio):
+        self.gpio = gpio
+        self.buttons = {}
+        self._edges = queue.SimpleQueue()
+        self._post = self._edges.put
+        self._thread = None
+        self._running = False
+
+    def add(self, button):
+        gpio = self.gpio
+        gpio.setup(
+            button.pin,
+            gpio.IN,
+            pull_up_down=gpio.PUD_UP if button.active_low else gpio.PUD_DOWN,
+        )
+        button.pressed = self._is_pressed(button)
+        self.buttons[button.pin] = button
+        gpio.add_event_detect(button.pin, gpio.BOTH, callback=self._edge)
+        return button
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._edges.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+        for pin in self.buttons:
+            self.gpio.remove_event_detect(pin)
+
+    async def run(self):
+        """Dispatch on the running event loop instead of a thread of its own.
+
+        Use either this or start(); callbacks then run on the loop and may
+        touch its objects directly.
+        """
+        loop = asyncio.get_running_loop()
+        edges = asyncio.Queue()
+        self._post = lambda edge: loop.call_soon_threadsafe(edges.put_nowait, edge)
+        timers = []
+        try:
+            while True:
+                try:
+                    edge = await asyncio.wait_for(edges.get(), self._timeout(timers))
+                except TimeoutError:
+                    edge = False
+                self._handle(edge, timers)
+        finally:
+            self._post = self._edges.put
+
+    def _edge(self, channel):
+        # Called from the GPIO backend's thread: record and get out
+        self._post((channel, time.monotonic()))
+
+    def _is_pressed(self, button):
+        return self.gpio.input(button.pin) != button.active_low
+
+    def _run(self):
+        # (deadline, pin) for settle and long-press checks; stale entries are
+        # skipped when they come up
+        timers = []
+        while self._running:
+            try:
+                edge = self._edges.get(timeout=self._timeout(timers))
+            except queue.Empty:
+                edge = False
+            if edge is None:
+                break
+            self._handle(edge, timers)
+
+    def _timeout(self, timers):
+        if not timers:
+            return None
+        return max(0.0, timers[0][0] - time.monotonic())
+
+    def _handle(self, edge, timers):
+        if edge:
+            pin, at = edge
+            button = self.buttons.get(pin)
+            if button is not None:
+                if button._first_edge is None:
+                    button._first_edge = at
+                button._settle_at = at + button.debounce
+                heapq.heappush(timers, (button._settle_at, pin))
+
+        now = time.monotonic()
+        while timers and timers[0][0] <= now:
+            deadline, pin = heapq.heappop(timers)
+            button = self.buttons[pin]
+            if deadline == button._settle_at:
+                self._settled(button, timers)
+            elif deadline == button._long_at:
+                button._long_at = None
+                if button.pressed and button.on_long_press:
+                    button.on_long_press(button)
+
+    def _settled(self, button, timers):
+        first_edge = button._first_edge
+        button._settle_at = None
+        button._first_edge = None
+
+        pressed = self._is_pressed(button)
+        if pressed == button.pressed:
+            # bounced back to where it was
+            return
+        button.pressed = pressed
+
+        if pressed:
+            button._long_at = time.monotonic() + button.long_press
+            heapq.heappush(timers, (button._long_at, button.pin))
+            button.press_latency = time.monotonic() - first_edge
+            if button.on_press:
+                button.on_press(button)
+        else:
+            button._long_at = None
+            if button.on_release:
+                button.on_release(button)
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""Suggest a CUES table from a WAV file.
+
+The audio is streamed in blocks (never loaded whole) and reduced with
+NumPy to one set of features per 10 ms hop: RMS level, onset strength
+(rise in level from the previous hop) and a silence flag. The show is then
+split into one segment per relay, like the hand-made table in main.py:
+each boundary is snapped to the nearest pause near an even split, and the
+next light comes on where speech resumes after it.
+
+    python cue_generator.py actual_monologue_boosted.wav
+    python cue_generator.py testing_audio.wav --pins 21 20 16 5 26
+
+Needs numpy (installed with the "analysis" extra).
+"""
+
+import argparse
+import os
+import wave
+
+import numpy as np
+
+HOP_SECONDS = 0.01
+BLOCK_SECONDS = 5.0
+
+# A hop counts as silent when it is this many dB below the loudest hops
+SILENCE_DB = 30.0
+
+# Pauses shorter than this are breaths, not paragraph breaks
+MIN_PAUSE = 0.4
+
+# Gap between one light going OFF and the next going ON, as in main.CUES
+SWITCH_GAP = 1.0
+
+
+class Features:
+    """Per-hop features of a recording"""
+
+    def __init__(self, hop, level_db, onset, duration):
+        self.hop = hop
+        self.level_db = level_db
+        self.onset = onset
+        self.duration = duration
+
+    def silence(self, silence_db=SILENCE_DB):
+        # Relative to the 95th percentile so the threshold follows the gain
+        loud = np.percentile(self.level_db, 95)
+        return self.level_db < loud - silence_db
+
+
+def _samples(data, width):
+    # Raw WAV frames -> interleaved float32 samples and their full scale
+    if width == 1:
+        return np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128.0, 128.0
+    if width == 2:
+        return np.frombuffer(data, dtype="<i2").astype(np.float32), 32768.0
+    if width == 3:
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = raw[:, 0] | raw[:, 1] << 8 | raw[:, 2] << 16
+        return ((ints ^ 0x800000) - 0x800000).astype(np.float32), 8388608.0
+    if width == 4:
+        return np.frombuffer(data, dtype="<i4").astype(np.float32), 2147483648.0
+    raise ValueError(f"Unsupported sample width: {width} bytes")
+
+
+def analyze(path, hop_seconds=HOP_SECONDS, block_seconds=BLOCK_SECONDS):
+    """Stream path and return its Features"""
+    with wave.open(path, "rb") as wav:
+        rate = wav.getframerate()
+        width = wav.getsampwidth()
+        channels = wav.getnchannels()
+        hop = max(1, int(rate * hop_seconds))
+        # Whole hops per block, so no hop straddles two blocks
+        block = hop * max(1, int(block_seconds / hop_seconds))
+        hop_samples = hop * channels
+
+        hops = -(-wav.getnframes() // hop)
+        level_db = np.empty(hops, dtype=np.float32)
+        filled = 0
+
+        while True:
+            data = wav.readframes(block)
+            if not data:
+                break
+            samples, scale = _samples(data, width)
+            count = -(-len(samples) // hop_samples)
+            if len(samples) != count * hop_samples:
+                # Only the last block can end part-way through a hop
+                samples = np.concatenate(
+                    (samples, np.zeros(count * hop_samples - len(samples), np.float32))
+                )
+            # Mean power over all channels of each hop
+            hops_view = samples.reshape(count, hop_samples)
+            power = np.einsum("ij,ij->i", hops_view, hops_view) / (hop_samples * scale**2)
+            level_db[filled : filled + count] = 10 * np.log10(power + 1e-18)
+            filled += count
+
+        duration = wav.getnframes() / rate
+
+    level_db = level_db[:filled]
+    onset = np.maximum(np.diff(level_db, prepend=level_db[:1]), 0.0)
+    return Features(hop / rate, level_db, onset, duration)
+
+
+def find_pauses(features, silence_db=SILENCE_DB, min_pause=MIN_PAUSE):
+    """(start, end) times of every pause at least min_pause long"""
+    silent = features.silence(silence_db).astype(np.int8)
+    edges = np.diff(np.concatenate(([0], silent, [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    keep = (ends - starts) * features.hop >= min_pause
+    return [
+        (float(start * features.hop), float(end * features.hop))
+        for start, end in zip(starts[keep], ends[keep])
+    ]
+
+
+def speech_resumes(features, after):
+    """Time of the strongest onset in the first half second after `after`"""
+    first = int(after / features.hop)
+    window = features.onset[first : first + int(0.5 / features.hop)]
+    if not len(window):
+        return after
+    return float((first + int(np.argmax(window))) * features.hop)
+
+
+def suggest_cues(features, pins, switch_gap=SWITCH_GAP, **pause_options):
+    """Return a CUES list lighting pins one after another across the show"""
+    pauses = find_pauses(features, **pause_options)
+    segment = features.duration / len(pins)
+    boundaries = []
+    for n in range(1, len(pins)):
+        target = segment * n
+        last_end = boundaries[-1][1] if boundaries else 0.0
+        # Only pauses within half a segment of the even split keep lights balanced
+        candidates = [
+            p for p in pauses
+            if p[0] > last_end and abs((p[0] + p[1]) / 2 - target) <= segment / 2
+        ]
+        if candidates:
+            pause = min(candidates, key=lambda p: abs((p[0] + p[1]) / 2 - target))
+        else:
+            split = max(target, last_end)
+            pause = (split, split)
+        boundaries.append(pause)
+
+    cues = []
+    on_time = 0.0
+    for pin, (pause_start, pause_end) in zip(pins, boundaries + [(None, None)]):
+        cues.append((round(on_time, 2), pin, True))
+        if pause_start is None:
+            cues.append((round(features.duration, 2), pin, False))
+            break
+        next_on = speech_resumes(features, pause_end)
+        off_time = max(on_time, min(pause_start, next_on - switch_gap))
+        cues.append((round(off_time, 2), pin, False))
+        on_time = next_on
+    return cues
+
+
+def format_cues(cues, pins):
+    """CUES table as Python source, in the style of main.py"""
+    names = {pin: f"LIGHT_{i + 1}_PIN" for i, pin in enumerate(pins)}
+    lines = ["CUES = ["]
+    for cue_time, pin, state in cues:
+        minutes, seconds = divmod(int(cue_time), 60)
+        light = names[pin].split("_")[1]
+        action = "ON" if state else "OFF"
+        lines.append(
+            f"    ({cue_time}, {names[pin]}, {state}),"
+            f"  # Light {light} {action} at {minutes}:{seconds:02d}"
+        )
+    lines.append("]")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("wav", help="WAV file to analyse")
+    parser.add_argument("--pins", type=int, nargs="+",
+                        help="relay pins in show order (default: main.RELAY_PINS)")
+    parser.add_argument("--silence-db", type=float, default=SILENCE_DB)
+    parser.add_argument("--min-pause", type=float, default=MIN_PAUSE)
+    args = parser.parse_args()
+
+    pins = args.pins
+    if pins is None:
+        # main.py needs RPi.GPIO, so read its pin table without importing it
+        pins = _main_relay_pins()
+
+    features = analyze(args.wav)
+    cues = suggest_cues(
+        features, pins, silence_db=args.silence_db, min_pause=args.min_pause
+    )
+    print(f"# {args.wav}: {features.duration:.2f} s, "
+          f"{len(find_pauses(features, args.silence_db, args.min_pause))} pauses")
+    print(format_cues(cues, pins))
+
+
+def _main_relay_pins():
+    import ast
+
+    # main.py sits next to this file, wherever the tool is run from
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")) as f:
+        tree = ast.parse(f.read())
+    values = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Name):
+            name = node.targets[0].id
+            if isinstance(node.value, ast.Constant):
+                values[name] = node.value.value
+            elif name == "RELAY_PINS":
+                return [values[element.id] for element in node.value.elts]
+    raise ValueError("RELAY_PINS not found in main.py")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Cue log kept off the cue loop.
+
+Printing from fire() means a write() to stdout per cue, and under systemd
+stdout is a pipe to the journal, which can stall; the next cue waits for
+it. CueLog.record() instead stores (cue index, scheduled time, actual
+time, pin, state) into preallocated arrays used as a ring, which costs a
+few stores and no system call. A writer thread formats whatever has
+piled up every FLUSH_INTERVAL and writes it in one go.
+
+There is one producer (the cue loop) and one consumer (the writer, or
+flush() under the same lock), and each position counter is only moved by
+its own side, so record() needs no lock. When the ring is full, new
+records are dropped and counted, and the next batch says how many.
+flush() formats a batch under that lock but writes it outside it, under
+a second lock taken before the first is let go, so batches come out in
+order. wake() asks the writer for a flush now, without waiting for it.
+"""
+
+import sys
+import threading
+from array import array
+
+LOG_CAPACITY = 4096
+
+# How often the writer thread looks for new records, in seconds
+FLUSH_INTERVAL = 0.25
+
+
+class CueLog:
+    """Fixed-size ring of cue records with a background writer"""
+
+    def __init__(self, capacity=LOG_CAPACITY, stream=None):
+        self.capacity = capacity
+        # None writes to whatever sys.stdout is at the time
+        self.stream = stream
+        self.indexes = array("q", bytes(8 * capacity))
+        self.scheduled = array("d", bytes(8 * capacity))
+        self.actual = array("d", bytes(8 * capacity))
+        self.pins = array("I", bytes(4 * capacity))
+        self.states = bytearray(capacity)
+        # Records ever stored / taken; slot = count % capacity
+        self.written = 0
+        self.read = 0
+        self.dropped = 0
+        self._reported_dropped = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def record(self, index, scheduled, actual, pin, state):
+        """Queue one pin change; never blocks and never does I/O"""
+        written = self.written
+        if written - self.read >= self.capacity:
+            self.dropped += 1
+            return
+        slot = written % self.capacity
+        self.indexes[slot] = index
+        self.scheduled[slot] = scheduled
+        self.actual[slot] = actual
+        self.pins[slot] = pin
+        self.states[slot] = 1 if state else 0
+        # Publish the slot only once it is filled in
+        self.written = written + 1
+
+    def start(self):
+        """Start the writer thread if it is not running"""
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="cue-log", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the writer thread and write out what is left"""
+        if self._thread is not None:
+            self._stopping.set()
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def wake(self):
+        """Have the writer thread flush now; returns at once"""
+        self._wake.set()
+
+    def flush(self):
+        """Write out every queued record now, from the calling thread"""
+        self._lock.acquire()
+        try:
+            lines = self._take()
+            if not lines:
+                return
+            # Queue up for the stream before letting the next batch be taken
+            self._write_lock.acquire()
+        finally:
+            self._lock.release()
+        try:
+            stream = self.stream or sys.stdout
+            stream.write("".join(lines))
+            stream.flush()
+        finally:
+            self._write_lock.release()
+
+    def _take(self):
+        # Format and consume the queued records; caller holds _lock
+        lines = []
+        read = self.read
+        written = self.written
+        while read < written:
+            slot = read % self.capacity
+            state = "ON" if self.states[slot] else "OFF"
+            late = (self.actual[slot] - self.scheduled[slot]) * 1000
+            lines.append(
+                f"{self.scheduled[slot]:6.2f}s | GPIO {self.pins[slot]} → {state}"
+                f"  (cue {self.indexes[slot]}, {late:+.3f} ms)\n"
+            )
+            read += 1
+        self.read = read
+
+        dropped = self.dropped
+        if dropped != self._reported_dropped:
+            lines.append(f"Cue log full: {dropped - self._reported_dropped} records dropped\n")
+            self._reported_dropped = dropped
+        return lines
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(FLUSH_INTERVAL)
+            self._wake.clear()
+            self.flush()
@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+# How long before a deadline we stop sleeping and spin on the clock.
+# time.sleep() on a Pi overshoots by a few hundred microseconds under load,
+# so waking up 2 ms early keeps cues from firing late.
+SPIN_MARGIN = 0.002
+
+# Fraction of a wait that wait_until_async() sleeps in one go
+SLEEP_FRACTION = 0.99
+
+
+def wait_until(deadline, clock, sleep=time.sleep, margin=SPIN_MARGIN):
+    """Sleep, then spin, until clock() reaches deadline; return clock()"""
+    remaining = deadline - clock()
+    if remaining > margin:
+        sleep(remaining - margin)
+
+    now = clock()
+    while now < deadline:
+        now = clock()
+    return now
+
+
+def run_timeline(times, fire, clock=None, sleep=time.sleep, margin=SPIN_MARGIN):
+    """Call fire(i) at each deadline in times and return per-cue lateness.
+
+    times must be sorted (cue_timeline.compile_cues does that) and given in
+    seconds from the start of the show. clock returns the current show time
+    in seconds; by default the show starts when this function is called.
+    Each wait is one coarse sleep up to `margin` before the deadline, then a
+    short spin on the clock, so a show costs a couple of wakeups per cue
+    instead of one per millisecond.
+    """
+    if clock is None:
+        start_time = time.monotonic()
+
+        def clock():
+            return time.monotonic() - start_time
+
+    lateness = []
+    for i, deadline in enumerate(times):
+        now = wait_until(deadline, clock, sleep, margin)
+        lateness.append(now - deadline)
+        fire(i)
+
+    return lateness
+
+
+async def wait_until_async(deadline, clock, margin=SPIN_MARGIN):
+    """wait_until() for an event loop: other tasks run during the sleep.
+
+    Only the last `margin` is spent spinning, so the loop is never held for
+    longer than that.
+    """
+    # The loop's epoll wait may run late by a fraction of its timeout (the
+    # kernel's timer slack, 0.1% and up), so long sleeps stop a little short
+    # and finish with a shorter one
+    remaining = deadline - clock()
+    while remaining > margin:
+        await asyncio.sleep((remaining - margin) * SLEEP_FRACTION)
+        remaining = deadline - clock()
+
+    now = clock()
+    while now < deadline:
+        now = clock()
+    return now
+
+
+async def run_timeline_async(times, fire, clock=None, margin=SPIN_MARGIN):
+    """run_timeline() as a task; fire(i) must not block"""
+    if clock is None:
+        start_time = time.monotonic()
+
+        def clock():
+            return time.monotonic() - start_time
+
+    lateness = []
+    for i, deadline in enumerate(times):
+        now = await wait_until_async(deadline, clock, margin)
+        lateness.append(now - deadline)
+        fire(i)
+
+    return lateness
+
+
+def summarize_lateness(lateness):
+    """Return (mean, max) lateness in milliseconds"""
+    if not lateness:
+        return 0.0, 0.0
+    return (
+        sum(lateness) / len(lateness) * 1000,
+        max(lateness) * 1000,
+    )
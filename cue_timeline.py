@@ -0,0 +1,81 @@
+"""Cue timeline compiler.
+
+Turns a CUES list of (time, pin, state) tuples into frames of
+(time, on_mask, off_mask): every cue sharing a timestamp is merged into
+one frame, cues that would not change a relay are dropped, and frames
+with nothing left to do disappear. Playback then needs one bank write
+per instant. Frames live in flat arrays, 24 bytes each, so a show with
+tens of thousands of cues stays small.
+"""
+
+import math
+from array import array
+
+
+class Timeline:
+    """A compiled show: parallel arrays of frame times and relay masks.
+
+    Masks are logical (bit n set = relay on pin n ON/OFF); ACTIVE_LOW is
+    applied when the frame is written.
+    """
+
+    def __init__(self, times, on_masks, off_masks):
+        self.times = times
+        self.on_masks = on_masks
+        self.off_masks = off_masks
+
+    def __len__(self):
+        return len(self.times)
+
+    def __iter__(self):
+        return zip(self.times, self.on_masks, self.off_masks)
+
+    def duration(self):
+        return self.times[-1] if len(self.times) else 0.0
+
+
+def _mask_array(width):
+    # Masks up to 64 channels pack into machine words; wider ones stay ints
+    return array("Q") if width <= 64 else []
+
+
+def compile_cues(cues, initial_on_mask=0):
+    """Compile cues into a Timeline, starting from relays in initial_on_mask ON.
+
+    Cues may be given in any order; ones with the same time keep their
+    listed order, so the last cue for a pin within a frame wins.
+    """
+    for cue_time, pin, state in cues:
+        if not math.isfinite(cue_time) or cue_time < 0:
+            raise ValueError(f"Invalid cue time {cue_time!r} for GPIO {pin}")
+        if pin < 0:
+            raise ValueError(f"Invalid pin {pin!r}")
+
+    ordered = sorted(cues, key=lambda cue: cue[0])
+    width = max((pin for _, pin, _ in ordered), default=0) + 1
+
+    times = array("d")
+    on_masks = _mask_array(width)
+    off_masks = _mask_array(width)
+
+    current = initial_on_mask
+    i = 0
+    while i < len(ordered):
+        frame_time = ordered[i][0]
+        wanted = current
+        while i < len(ordered) and ordered[i][0] == frame_time:
+            _, pin, state = ordered[i]
+            if state:
+                wanted |= 1 << pin
+            else:
+                wanted &= ~(1 << pin)
+            i += 1
+
+        changed = wanted ^ current
+        if changed:
+            times.append(frame_time)
+            on_masks.append(changed & wanted)
+            off_masks.append(changed & current)
+            current = wanted
+
+    return Timeline(times, on_masks, off_masks)
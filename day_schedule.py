@@ -0,0 +1,205 @@
+"""Day/night schedule that knows when it next changes.
+
+A Schedule is a list of Windows during which it is "active" (for the light
+show: daytime, lights simply stay on). Each window has a start and an end,
+written as a wall-clock time or relative to the sun:
+
+    "01:30"  "18:00"  "sunrise"  "sunset"  "sunset-30"  "sunrise+15"
+
+(offsets in minutes), optionally limited to some weekdays of its start.
+A window whose end comes before its start runs past midnight. Sunrise and
+sunset are calculated offline from latitude/longitude.
+
+Everything is resolved to absolute timestamps in the schedule's time zone,
+so DST changes simply make a night an hour longer or shorter, and
+next_transition() can be slept on instead of polling:
+
+    DAYTIME = Schedule([Window("sunrise", "sunset-30")], latitude=19.08, longitude=72.88)
+    while True:
+        on = DAYTIME.is_active()
+        time.sleep(DAYTIME.seconds_until_change())
+"""
+
+import math
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from datetime import time as clock_time
+from zoneinfo import ZoneInfo
+
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+# Longest single sleep: a Pi has no RTC and steps its clock when NTP syncs,
+# so a far-away transition is re-checked now and then
+MAX_SLEEP = 600.0
+
+# Days of windows resolved at a time; a week covers every weekday rule
+HORIZON_DAYS = 8
+
+# Sun altitude at sunrise/sunset: refraction plus the radius of the disc
+SUN_ALTITUDE = -0.833
+
+_J2000 = datetime(2000, 1, 1, 12, tzinfo=timezone.utc)
+_ENDPOINT = re.compile(r"^(?:(\d{1,2}):(\d{2})|(sunrise|sunset)(?:([+-])(\d+))?)$")
+
+
+def sun_times(date, latitude, longitude):
+    """Return (sunrise, sunset) on date as UTC datetimes.
+
+    Uses the sunrise equation, good to a minute or two away from the poles.
+    With no sunrise (polar night) both are solar noon; with no sunset
+    (midnight sun) they are twelve hours either side of it.
+    """
+    # Days from J2000 to the solar noon nearest this date at this longitude
+    julian_noon = date.toordinal() + 1721425
+    days = round(julian_noon - 2451545.0 + 0.0008) - longitude / 360
+
+    anomaly = math.radians((357.5291 + 0.98560028 * days) % 360)
+    center = (
+        1.9148 * math.sin(anomaly)
+        + 0.0200 * math.sin(2 * anomaly)
+        + 0.0003 * math.sin(3 * anomaly)
+    )
+    ecliptic = math.radians((math.degrees(anomaly) + center + 180 + 102.9372) % 360)
+    transit = days + 0.0053 * math.sin(anomaly) - 0.0069 * math.sin(2 * ecliptic)
+
+    sin_declination = math.sin(ecliptic) * math.sin(math.radians(23.4397))
+    cos_declination = math.cos(math.asin(sin_declination))
+    lat = math.radians(latitude)
+    cos_hour_angle = (
+        math.sin(math.radians(SUN_ALTITUDE)) - math.sin(lat) * sin_declination
+    ) / (math.cos(lat) * cos_declination)
+    hour_angle = math.degrees(math.acos(min(1.0, max(-1.0, cos_hour_angle))))
+
+    return (
+        _J2000 + timedelta(days=transit - hour_angle / 360),
+        _J2000 + timedelta(days=transit + hour_angle / 360),
+    )
+
+
+def _parse_endpoint(text):
+    match = _ENDPOINT.match(text.strip().lower())
+    if not match:
+        raise ValueError(f"Invalid schedule time {text!r}")
+    hour, minute, event, sign, offset = match.groups()
+    if event is None:
+        return clock_time(int(hour), int(minute))
+    minutes = int(offset or 0)
+    return event, -minutes if sign == "-" else minutes
+
+
+class Window:
+    """One active period, e.g. Window("01:30", "11:00", days=("sat", "sun"))"""
+
+    def __init__(self, start, end, days=None):
+        self.text = f"{start}-{end}"
+        self.start = _parse_endpoint(start)
+        self.end = _parse_endpoint(end)
+        if days is None:
+            self.days = None
+        else:
+            self.days = frozenset(WEEKDAYS.index(day.lower()[:3]) for day in days)
+            self.text += " " + ",".join(WEEKDAYS[day] for day in sorted(self.days))
+
+    def uses_sun(self):
+        return not isinstance(self.start, clock_time) or not isinstance(self.end, clock_time)
+
+    def __str__(self):
+        return self.text
+
+
+class Schedule:
+    """A set of Windows in one time zone (tz name, or None for the system's)"""
+
+    def __init__(self, windows, latitude=None, longitude=None, tz=None):
+        self.windows = list(windows)
+        self.latitude = latitude
+        self.longitude = longitude
+        self.zone = ZoneInfo(tz) if tz else None
+        if latitude is None or longitude is None:
+            for window in self.windows:
+                if window.uses_sun():
+                    raise ValueError(f"Window {window} needs latitude and longitude")
+
+        # [from, until) during which is_active() returns active
+        self._from = math.inf
+        self._until = -math.inf
+        self._active = False
+
+    def __str__(self):
+        return ", ".join(str(window) for window in self.windows)
+
+    def _resolve(self, endpoint, date):
+        # Timestamp of an endpoint on a local date
+        if isinstance(endpoint, clock_time):
+            naive = datetime.combine(date, endpoint)
+            if self.zone is None:
+                return naive.astimezone().timestamp()
+            return naive.replace(tzinfo=self.zone).timestamp()
+        event, offset = endpoint
+        sunrise, sunset = sun_times(date, self.latitude, self.longitude)
+        return (sunrise if event == "sunrise" else sunset).timestamp() + offset * 60
+
+    def _local_date(self, timestamp):
+        return datetime.fromtimestamp(timestamp, self.zone).date()
+
+    def intervals(self, timestamp, days=HORIZON_DAYS):
+        """Merged (start, end) timestamps of active time near timestamp"""
+        today = self._local_date(timestamp)
+        spans = []
+        for offset in range(-1, days):
+            date = today + timedelta(days=offset)
+            for window in self.windows:
+                if window.days is not None and date.weekday() not in window.days:
+                    continue
+                start = self._resolve(window.start, date)
+                end = self._resolve(window.end, date)
+                if end < start:
+                    end = self._resolve(window.end, date + timedelta(days=1))
+                if end > start:
+                    spans.append((start, end))
+
+        merged = []
+        for start, end in sorted(spans):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        return [(start, end) for start, end in merged]
+
+    def _update(self, timestamp):
+        # Find the state at timestamp and how long it lasts
+        self._active = False
+        self._from = timestamp
+        self._until = math.inf
+        for start, end in self.intervals(timestamp):
+            if end <= timestamp:
+                continue
+            if start <= timestamp:
+                self._active = True
+                self._until = end
+            else:
+                self._until = start
+            break
+
+    def is_active(self, timestamp=None):
+        """Whether timestamp (default: now) falls in a window"""
+        if timestamp is None:
+            timestamp = time.time()
+        if not self._from <= timestamp < self._until:
+            self._update(timestamp)
+        return self._active
+
+    def next_transition(self, timestamp=None):
+        """Timestamp of the next change after timestamp, or None if none is near"""
+        self.is_active(timestamp)
+        return None if self._until == math.inf else self._until
+
+    def seconds_until_change(self, timestamp=None, max_sleep=MAX_SLEEP):
+        """How long to sleep before is_active() may give another answer"""
+        if timestamp is None:
+            timestamp = time.time()
+        change = self.next_transition(timestamp)
+        if change is None:
+            return max_sleep
+        return min(max_sleep, max(0.0, change - timestamp))
@@ -0,0 +1,174 @@
+"""Relays that follow the audio as it plays.
+
+The ALSA player hands every block to EnvelopeShow.on_block before
+writing it (straight out of its mapping of the WAV), so the analysis
+reads the same samples the speaker gets. Each block's RMS level decides
+how many of the relays are on, VU-meter style, with hysteresis between
+steps and a minimum hold per relay so they don't chatter. Because a
+block is analysed before it reaches the DAC, the change is scheduled for
+the moment the middle of the block is heard and applied against the
+player's clock, so the only delay between sound and relay is the
+dispatch lateness that gets reported.
+"""
+
+import asyncio
+import math
+import operator
+import queue
+from array import array
+
+from cue_scheduler import wait_until, wait_until_async
+
+# Level mapped to the first and to the last relay, in dBFS
+FLOOR_DB = -45.0
+CEIL_DB = -12.0
+
+# How far the level must move past a step before the count changes
+HYSTERESIS_DB = 3.0
+
+# Shortest time a relay stays in one state
+MIN_HOLD = 0.15
+
+# How fast the tracked level may fall; rises are followed immediately
+RELEASE_DB_PER_S = 40.0
+
+# array typecodes for signed samples of each WAV sample width
+_TYPECODES = {2: "h", 4: "i"}
+
+
+def block_level_db(data, sample_width):
+    """RMS level of a block of PCM samples in dBFS"""
+    if sample_width == 1:
+        # 8-bit WAV is unsigned
+        samples = [value - 128 for value in data]
+        full_scale = 128.0
+    elif sample_width in _TYPECODES:
+        samples = array(_TYPECODES[sample_width])
+        samples.frombytes(data)
+        full_scale = float(1 << (8 * sample_width - 1))
+    else:
+        raise ValueError(f"Envelope mode does not support {sample_width}-byte samples")
+
+    if not samples:
+        return -math.inf
+    power = sum(map(operator.mul, samples, samples)) / len(samples)
+    if power <= 0:
+        return -math.inf
+    return 10 * math.log10(power) - 20 * math.log10(full_scale)
+
+
+class EnvelopeFollower:
+    """Turns a level in dB into relay changes"""
+
+    def __init__(self, pins, floor_db=FLOOR_DB, ceil_db=CEIL_DB,
+                 hysteresis_db=HYSTERESIS_DB, min_hold=MIN_HOLD,
+                 release_db_per_s=RELEASE_DB_PER_S):
+        self.pins = list(pins)
+        self.hysteresis_db = hysteresis_db
+        self.min_hold = min_hold
+        self.release_db_per_s = release_db_per_s
+
+        # Level at which relay k (1-based) joins in
+        steps = max(1, len(self.pins) - 1)
+        self.thresholds = [
+            floor_db + (ceil_db - floor_db) * k / steps for k in range(len(self.pins))
+        ]
+
+        self.level_db = -math.inf
+        self.count = 0
+        self.on = [False] * len(self.pins)
+        self.last_change = [-math.inf] * len(self.pins)
+        self.last_time = None
+
+    def update(self, level_db, now):
+        """Feed the level at time now; return (on_mask, off_mask) to apply"""
+        if self.last_time is not None:
+            fallen = self.level_db - self.release_db_per_s * (now - self.last_time)
+            level_db = max(level_db, fallen)
+        self.level_db = level_db
+        self.last_time = now
+
+        half = self.hysteresis_db / 2
+        thresholds = self.thresholds
+        while self.count < len(thresholds) and level_db > thresholds[self.count] + half:
+            self.count += 1
+        while self.count > 0 and level_db < thresholds[self.count - 1] - half:
+            self.count -= 1
+
+        on_mask = 0
+        off_mask = 0
+        for i, pin in enumerate(self.pins):
+            want = i < self.count
+            if want != self.on[i] and now - self.last_change[i] >= self.min_hold:
+                self.on[i] = want
+                self.last_change[i] = now
+                if want:
+                    on_mask |= 1 << pin
+                else:
+                    off_mask |= 1 << pin
+        return on_mask, off_mask
+
+
+class EnvelopeShow:
+    """Schedules the follower's changes against the audio clock"""
+
+    def __init__(self, follower, write):
+        self.follower = follower
+        self.write = write
+        self.changes = queue.Queue()
+        self._post = self.changes.put
+        self.lateness = []
+
+    def on_block(self, data, start, duration, sample_width):
+        # Runs on the playback thread, ahead of the DAC by the ALSA buffer
+        heard_at = start + duration / 2
+        on_mask, off_mask = self.follower.update(
+            block_level_db(data, sample_width), heard_at
+        )
+        if on_mask or off_mask:
+            self._post((heard_at, on_mask, off_mask))
+
+    def run(self, player):
+        """Apply changes as their audio is heard, until playback ends"""
+        while player.is_playing() or not self.changes.empty():
+            try:
+                heard_at, on_mask, off_mask = self.changes.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            now = wait_until(heard_at, player.position)
+            self.write(on_mask, off_mask)
+            self.lateness.append(now - heard_at)
+        return self.lateness
+
+    async def run_async(self, player, poll=0.1):
+        """run() as a task: changes are handed to the loop by the playback thread"""
+        loop = asyncio.get_running_loop()
+        changes = asyncio.Queue()
+        self._post = lambda change: loop.call_soon_threadsafe(changes.put_nowait, change)
+
+        def take_stragglers():
+            # Changes put on self.changes: blocks analysed before this task
+            # started, or by an on_block that read the old _post just before
+            # the swap. Looked for on every pass, so none is left behind
+            while not self.changes.empty():
+                changes.put_nowait(self.changes.get_nowait())
+
+        try:
+            while True:
+                playing = player.is_playing()
+                if not playing:
+                    # Let changes already handed to the loop arrive
+                    await asyncio.sleep(0)
+                take_stragglers()
+                if not playing and changes.empty():
+                    break
+                try:
+                    heard_at, on_mask, off_mask = await asyncio.wait_for(changes.get(), poll)
+                except TimeoutError:
+                    continue
+                now = await wait_until_async(heard_at, player.position)
+                self.write(on_mask, off_mask)
+                self.lateness.append(now - heard_at)
+        finally:
+            self._post = self.changes.put
+        return self.lateness
@@ -0,0 +1,59 @@
+"""Multi-pin bank writes.
+
+A bank write takes two bitmasks over BCM pin numbers (bit n = GPIO n):
+pins in set_mask go HIGH and pins in clear_mask go LOW, all in one
+operation. That is the shape of the SoC's GPSET/GPCLR registers, so
+backends that can write those registers switch every pin in the same
+instant. Backends without output_bank() fall back to RPi.GPIO's list form
+of output(), which is still a single call.
+"""
+
+
+def pin_mask(pins):
+    """Bitmask with the bit of every pin in pins set"""
+    mask = 0
+    for pin in pins:
+        mask |= 1 << pin
+    return mask
+
+
+def mask_pins(mask):
+    """Pins whose bit is set in mask, lowest first"""
+    pins = []
+    while mask:
+        low = mask & -mask
+        pins.append(low.bit_length() - 1)
+        mask ^= low
+    return pins
+
+
+def states_to_masks(states):
+    """Turn a {pin: level} mapping into (set_mask, clear_mask)"""
+    set_mask = 0
+    clear_mask = 0
+    for pin, level in states.items():
+        if level:
+            set_mask |= 1 << pin
+        else:
+            clear_mask |= 1 << pin
+    return set_mask, clear_mask
+
+
+def write_bank(gpio, set_mask, clear_mask):
+    """Drive set_mask HIGH and clear_mask LOW on the gpio backend at once"""
+    if set_mask & clear_mask:
+        raise ValueError("A pin cannot be both set and cleared")
+
+    output_bank = getattr(gpio, "output_bank", None)
+    if output_bank is not None:
+        output_bank(set_mask, clear_mask)
+        return
+
+    if not set_mask and not clear_mask:
+        return
+    set_pins = mask_pins(set_mask)
+    clear_pins = mask_pins(clear_mask)
+    gpio.output(
+        set_pins + clear_pins,
+        [gpio.HIGH] * len(set_pins) + [gpio.LOW] * len(clear_pins),
+    )
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""GPIO transition trace: record what the pins did, replay it, diff it.
+
+TracedGPIO wraps a GPIO backend and logs every output level it is asked
+to drive as (time.monotonic_ns(), pin, level) into a TraceRecorder: three
+preallocated arrays used as a ring buffer, so recording stores numbers
+into existing slots and never grows or allocates per event. The newest
+`capacity` events are kept; dump() writes them to a small binary file
+(13 bytes per event). Pins are stored 32 bits wide, so shift-register and
+DMX channels above 255 are traced like header pins.
+
+    python gpio_trace.py show gpio_trace.bin
+    python gpio_trace.py replay gpio_trace.bin --speed 10 --backend gui
+    python gpio_trace.py diff gpio_trace.bin shows/monologue.show
+"""
+
+import argparse
+import struct
+import sys
+import time
+from array import array
+
+from gpio_bank import write_bank
+
+TRACE_CAPACITY = 65536
+
+_MAGIC = b"RPTRACE2"
+# Dumps from before pins were widened, with one byte per pin
+_MAGIC_BYTE_PINS = b"RPTRACE1"
+# magic, events ever recorded, events in the file
+_HEADER = struct.Struct("<8sQI")
+
+
+class TraceRecorder:
+    """Ring buffer of (monotonic_ns, pin, level)"""
+
+    def __init__(self, capacity=TRACE_CAPACITY):
+        self.capacity = capacity
+        self.times = array("q", bytes(8 * capacity))
+        self.pins = array("I", bytes(4 * capacity))
+        self.levels = bytearray(capacity)
+        self.total = 0
+        self._next = 0
+
+    def record(self, pin, level, now_ns=None):
+        i = self._next
+        self.times[i] = time.monotonic_ns() if now_ns is None else now_ns
+        self.pins[i] = pin
+        self.levels[i] = 1 if level else 0
+        self._next = 0 if i + 1 == self.capacity else i + 1
+        self.total += 1
+
+    def record_bank(self, set_mask, clear_mask):
+        # One timestamp for the whole write, as the pins switch together
+        now_ns = time.monotonic_ns()
+        for level, mask in ((1, set_mask), (0, clear_mask)):
+            while mask:
+                low = mask & -mask
+                mask ^= low
+                self.record(low.bit_length() - 1, level, now_ns)
+
+    def events(self):
+        """Recorded (monotonic_ns, pin, level), oldest first"""
+        count = min(self.total, self.capacity)
+        start = self._next - count
+        return [
+            (self.times[i], self.pins[i], self.levels[i])
+            for i in (start + k for k in range(count))
+        ]
+
+    def dump(self, path):
+        """Write the recorded events to path; return how many"""
+        events = self.events()
+        times = array("q", (t for t, _, _ in events))
+        pins = array("I", (pin for _, pin, _ in events))
+        if sys.byteorder != "little":
+            times.byteswap()
+            pins.byteswap()
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, self.total, len(events)))
+            times.tofile(f)
+            pins.tofile(f)
+            f.write(bytes(level for _, _, level in events))
+        return len(events)
+
+
+def load_trace(path):
+    """Read a dump; return (events ever recorded, [(monotonic_ns, pin, level)])"""
+    with open(path, "rb") as f:
+        magic, total, count = _HEADER.unpack(f.read(_HEADER.size))
+        if magic not in (_MAGIC, _MAGIC_BYTE_PINS):
+            raise ValueError(f"{path} is not a GPIO trace")
+        times = array("q")
+        times.fromfile(f, count)
+        if magic == _MAGIC:
+            pins = array("I")
+            pins.fromfile(f, count)
+        else:
+            pins = array("I", f.read(count))
+        if sys.byteorder != "little":
+            times.byteswap()
+            if magic == _MAGIC:
+                pins.byteswap()
+        levels = f.read(count)
+    return total, list(zip(times, pins, levels))
+
+
+class TracedGPIO:
+    """A GPIO backend whose outputs are also logged to a TraceRecorder.
+
+    Everything other than output() and output_bank() is passed through.
+    """
+
+    def __init__(self, gpio, recorder):
+        self._gpio = gpio
+        self._recorder = recorder
+
+    def __getattr__(self, name):
+        return getattr(self._gpio, name)
+
+    def output(self, channel, value):
+        self._gpio.output(channel, value)
+        if isinstance(channel, (list, tuple)):
+            if not isinstance(value, (list, tuple)):
+                value = [value] * len(channel)
+            now_ns = time.monotonic_ns()
+            for pin, level in zip(channel, value):
+                self._recorder.record(pin, level, now_ns)
+        else:
+            self._recorder.record(channel, value)
+
+    def output_bank(self, set_mask, clear_mask):
+        write_bank(self._gpio, set_mask, clear_mask)
+        self._recorder.record_bank(set_mask, clear_mask)
+
+
+def _frames(events):
+    # Events sharing a timestamp -> (seconds from first event, set, clear)
+    frames = []
+    if not events:
+        return frames
+    first = events[0][0]
+    for t_ns, pin, level in events:
+        t = (t_ns - first) / 1e9
+        if not frames or frames[-1][0] != t:
+            frames.append([t, 0, 0])
+        frames[-1][1 if level else 2] |= 1 << pin
+    return frames
+
+
+def replay(events, gpio, speed=1.0):
+    """Drive gpio through events, speed times faster than recorded"""
+    from cue_scheduler import run_timeline
+
+    frames = _frames(events)
+    pins = sorted({pin for _, pin, _ in events})
+    gpio.setmode(gpio.BCM)
+    for pin in pins:
+        gpio.setup(pin, gpio.OUT)
+
+    def fire(i):
+        _, set_mask, clear_mask = frames[i]
+        write_bank(gpio, set_mask & ~clear_mask, clear_mask)
+
+    return run_timeline([frame[0] / speed for frame in frames], fire)
+
+
+def diff(events, show, tolerance=0.01):
+    """Compare a trace with what show's timeline meant to do.
+
+    The trace is lined up on its first transition that the show's first
+    frame asks for. Returns (report lines, number of problems).
+    """
+    active_low = show.info.active_low
+    expected = []
+    for frame_time, on_mask, off_mask in show.timeline:
+        for level, mask in ((1, on_mask), (0, off_mask)):
+            while mask:
+                low = mask & -mask
+                mask ^= low
+                physical = level ^ active_low
+                expected.append((frame_time, low.bit_length() - 1, physical))
+
+    # Keep only real changes from the trace, per pin
+    levels = {}
+    actual = []
+    for t_ns, pin, level in events:
+        if levels.get(pin) != level:
+            levels[pin] = level
+            actual.append((t_ns / 1e9, pin, level))
+
+    first = expected[0] if expected else None
+    start = next(
+        (t - first[0] for t, pin, level in actual if (pin, level) == first[1:]), None
+    ) if first else None
+    if start is None:
+        return ["Trace never does what the show starts with"], 1
+
+    lines = []
+    problems = 0
+    unmatched = [(t - start, pin, level) for t, pin, level in actual if t >= start]
+    for cue_time, pin, level in expected:
+        match = next(
+            (event for event in unmatched if event[1:] == (pin, level)), None
+        )
+        state = "HIGH" if level else "LOW"
+        if match is None:
+            lines.append(f"{cue_time:8.3f}s GPIO {pin:2d} {state:4}  MISSING")
+            problems += 1
+            continue
+        unmatched.remove(match)
+        error = match[0] - cue_time
+        flag = ""
+        if abs(error) > tolerance:
+            flag = "  LATE" if error > 0 else "  EARLY"
+            problems += 1
+        lines.append(f"{cue_time:8.3f}s GPIO {pin:2d} {state:4}  {error * 1000:+9.3f} ms{flag}")
+    for t, pin, level in unmatched:
+        lines.append(f"{t:8.3f}s GPIO {pin:2d} {'HIGH' if level else 'LOW':4}  UNEXPECTED")
+        problems += 1
+    return lines, problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    show_cmd = commands.add_parser("show", help="print a trace")
+    show_cmd.add_argument("trace")
+    replay_cmd = commands.add_parser("replay", help="play a trace into an emulator")
+    replay_cmd.add_argument("trace")
+    replay_cmd.add_argument("--speed", type=float, default=1.0)
+    replay_cmd.add_argument("--backend", choices=("headless", "gui"), default="headless")
+    diff_cmd = commands.add_parser("diff", help="compare a trace with a show file")
+    diff_cmd.add_argument("trace")
+    diff_cmd.add_argument("show", help="NAME.show or NAME.showc")
+    diff_cmd.add_argument("--tolerance-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    total, events = load_trace(args.trace)
+    if total > len(events):
+        print(f"# {total - len(events)} older events were overwritten")
+
+    if args.command == "show":
+        first = events[0][0] if events else 0
+        for t_ns, pin, level in events:
+            print(f"{(t_ns - first) / 1e9:10.6f}s GPIO {pin:2d} {'HIGH' if level else 'LOW'}")
+    elif args.command == "replay":
+        if args.backend == "gui":
+            from EmulatorGUI import GPIO
+        else:
+            from EmulatorHeadless import GPIO
+            GPIO.record()
+        lateness = replay(events, GPIO, args.speed)
+        print(f"Replayed {len(events)} events, max lateness "
+              f"{max(lateness, default=0) * 1000:.3f} ms")
+    else:
+        import show_library
+
+        if args.show.endswith(show_library.COMPILED_SUFFIX):
+            show = show_library.read_compiled_show(args.show)
+        else:
+            show = show_library.read_text_show(args.show)
+        lines, problems = diff(events, show, args.tolerance_ms / 1000)
+        print("\n".join(lines))
+        print(f"{problems} problem(s)")
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
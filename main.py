@@ -1,26 +1,97 @@
 #!/usr/bin/env python3
 
+import asyncio
+import contextlib
 import signal
-import subprocess
 import sys
 import time
-from datetime import datetime
 
 import RPi.GPIO as GPIO
 
+from audio_player import START_TIMEOUT, open_player
+from button_events import Button, InputEvents
+from cue_log import CueLog
+from cue_scheduler import run_timeline_async, summarize_lateness, wait_until_async
+from cue_timeline import compile_cues
+from day_schedule import Schedule, Window
+from envelope_mode import EnvelopeFollower, EnvelopeShow
+from gpio_bank import mask_pins, pin_mask, write_bank
+from gpio_trace import TRACE_CAPACITY, TraceRecorder, TracedGPIO
+from metrics import REGISTRY
+from metrics import serve as serve_metrics
+from realtime import RealtimeProfile
+from relay_state import RelayState
+from show_controller import PinWriter, ShowController
+from show_library import ShowLibrary, use_relay_settings
+from show_sync import SYNC_PORT, open_follower, open_leader
+
 # from EmulatorGUI import GPIO
+# from EmulatorHeadless import GPIO
+# from MmapGPIO import GPIO
+# from ShiftGPIO import GPIO  # RELAY_PINS are then channels on the 74HC595 chain
+# from ArtNetGPIO import GPIO  # RELAY_PINS are then DMX channels (0 = universe 0 slot 1);
+#                               # set ACTIVE_LOW = False, or ON sends level 0
 
 
 # ===================== CONFIG =====================
 
+# Daytime windows: lights simply stay on and no show runs. Windows can
+# also use "sunrise"/"sunset" (e.g. "sunset-30") given latitude= and
+# longitude=; see day_schedule.py
+DAYTIME = Schedule([Window("01:30", "11:00")])
+
+# Play SHOWS_DIR/SHOW_NAME.show (see show_library.py) instead of the
+# ACTIVE_LOW/AUDIO_FILE/RELAY_PINS/CUES below; edits to the file are
+# picked up before the next show
+SHOW_NAME = None
+SHOWS_DIR = "shows"
+
 # True if your relay board turns ON when GPIO is LOW
 ACTIVE_LOW = False
 
 # Audio file (WAV recommended for accurate timing)
 AUDIO_FILE = "actual_monologue_boosted.wav"
 
-# Global audio process handle
-audio_proc = None
+# True to time cues against the samples ALSA has actually played,
+# False to use a wall clock started right after spawning aplay
+AUDIO_CLOCK = True
+
+# Warn when a cue fires further than this from its audio position
+SYNC_TOLERANCE_MS = 5.0
+
+# Run the cues of each show with real-time priority, locked memory, a CPU
+# of their own and no GC pauses, as far as privileges allow; see realtime.py
+REALTIME = False
+
+# "cues" plays the CUES table, "envelope" lets the relays follow the audio
+LIGHT_MODE = "cues"
+
+# BCM pin of a push button (to GND) that starts the show on demand, or None
+BUTTON_PIN = None
+
+# Shows on several Pis in step: None to run on our own, "leader" on one
+# Pi and "follower" on the others, which then play the leader's shows
+SYNC_ROLE = None
+
+# Address of the leader Pi, used by followers
+SYNC_LEADER = "192.168.1.10"
+
+# SyncLeader/SyncFollower once SYNC_ROLE is set up
+sync = None
+
+# Where to serve metrics in the Prometheus text format: ("127.0.0.1", 9105)
+# for TCP, a path for a Unix socket, or None for no endpoint
+METRICS_ADDRESS = None
+
+# Where the trace of every GPIO output is saved on exit or on SIGUSR1
+# (see gpio_trace.py to print, replay or diff it)
+TRACE_FILE = "gpio_trace.bin"
+
+# ShowLibrary of SHOWS_DIR, opened with the first show
+show_library = None
+
+# Global audio player handle, opened once and reused for every show
+audio_player = None
 
 
 LIGHT_1_PIN = 6  # GPIO21 (pin 40)
@@ -44,6 +115,13 @@ RELAY_PINS = [
     # LIGHT_8_PIN,
 ]
 
+# Bitmask of every relay pin, for switching them all in one bank write
+ALL_RELAYS = pin_mask(RELAY_PINS)
+
+# Every pin set up as an output since the last GPIO.cleanup(); backends
+# that track modes refuse to set one up twice
+SETUP_PINS = set()
+
 # Cue format:
 # (time_in_seconds_from_start, gpio_pin, state)
 # state: True = ON, False = OFF
@@ -69,121 +147,409 @@ CUES = [
 # ================================================
 
 
+# Last TRACE_CAPACITY output levels, logged by every GPIO output call
+gpio_trace = TraceRecorder(TRACE_CAPACITY)
+GPIO = TracedGPIO(GPIO, gpio_trace)
+
+# What every relay was last switched to, plus switch counts and on-time
+relay_state = RelayState()
+
+# Cue printouts, written by a thread of their own rather than between cues
+cue_log = CueLog()
+
+# Metrics (see metrics.py), updated in place and read by the endpoint
+cue_lateness = REGISTRY.histogram(
+    "lights_cue_lateness_seconds", "How late each cue frame fired against the show clock"
+)
+cues_fired = REGISTRY.counter("lights_cues_fired_total", "Cue frames written")
+audio_start_latency = REGISTRY.histogram(
+    "lights_audio_start_latency_seconds", "Time from play() to the first sample leaving ALSA"
+)
+shows_played = REGISTRY.counter("lights_shows_total", "Shows played to the end")
+show_duration = REGISTRY.gauge(
+    "lights_show_duration_seconds", "Time from audio start to audio end of the last show"
+)
+audio_duration = REGISTRY.gauge(
+    "lights_audio_duration_seconds", "Length of the last show's audio file"
+)
+gpio_writes = REGISTRY.counter("lights_gpio_writes_total", "Bank writes sent to the GPIO backend")
+gpio_writes_skipped = REGISTRY.counter(
+    "lights_gpio_writes_skipped_total", "Bank writes left out because no relay would change"
+)
+loop_iteration = REGISTRY.histogram(
+    "lights_schedule_loop_seconds",
+    "Time per pass of the day/night loop",
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+)
+REGISTRY.callback(
+    "lights_relay_switches_total", "Times each relay switched", "counter", "gpio",
+    lambda: {pin: relay_state.actuations(pin) for pin in RELAY_PINS},
+)
+REGISTRY.callback(
+    "lights_relay_on_seconds_total", "Time each relay has been ON", "counter", "gpio",
+    lambda: {pin: relay_state.on_time(pin) for pin in RELAY_PINS},
+)
+
+
 def relay_on(pin):
-    GPIO.output(pin, GPIO.LOW if ACTIVE_LOW else GPIO.HIGH)
+    relay_bank(1 << pin, 0)
 
 
 def relay_off(pin):
-    GPIO.output(pin, GPIO.HIGH if ACTIVE_LOW else GPIO.LOW)
+    relay_bank(0, 1 << pin)
+
+
+def relay_bank(on_mask, off_mask):
+    # Switch the relays in on_mask ON and those in off_mask OFF in one write,
+    # leaving out relays that are already that way
+    on_mask, off_mask = relay_state.changes(on_mask, off_mask)
+    if not on_mask and not off_mask:
+        gpio_writes_skipped.inc()
+        return
+    if ACTIVE_LOW:
+        on_mask, off_mask = off_mask, on_mask
+    write_bank(GPIO, on_mask, off_mask)
+    gpio_writes.inc()
+
+
+# The only task that writes to the relays; everything else queues through it
+relays = PinWriter(relay_bank)
+
+# Runs the schedule, the button and signal handling on one event loop
+controller = ShowController()
+
+
+def get_audio_player():
+    # Open the audio device and map the WAV on first use only
+    global audio_player
+    if audio_player is None:
+        audio_player = open_player(AUDIO_FILE, AUDIO_CLOCK)
+    return audio_player
+
+
+async def audio_started(player, poll=0.001):
+    # Poll rather than block a thread: the first cue is due the moment
+    # playback starts
+    for _ in range(int(START_TIMEOUT / poll)):
+        if player.wait_started(0):
+            return
+        await asyncio.sleep(poll)
+
+
+def realtime_profile():
+    # Entered for the part of a show where cues fire
+    if not REALTIME:
+        return contextlib.nullcontext()
+    return RealtimeProfile()
+
+
+def audio_worker(player):
+    # Thread or process playing the audio, if the player has one
+    worker_id = getattr(player, "worker_id", None)
+    return worker_id() if worker_id else None
+
+
+def load_show():
+    """Return the Timeline of the next show.
+
+    With SHOW_NAME set, the show file is only parsed again if it changed
+    since the last show, and its settings replace the constants.
+    """
+    global show_library
+    if SHOW_NAME is None:
+        return compile_cues(CUES)
+
+    if show_library is None:
+        show_library = ShowLibrary(SHOWS_DIR)
+    for name in show_library.refresh():
+        print(f"Show {name} changed on disk")
+    show = show_library.load(SHOW_NAME)
+    use_show_settings(show.info)
+    return show.timeline
+
+
+def use_show_settings(info):
+    # Rewire relays and audio if a show file changed them
+    global AUDIO_FILE, audio_player
+    use_relay_settings(sys.modules[__name__], info, relays.write)
+
+    if info.audio and info.audio != AUDIO_FILE:
+        stop_audio()
+        audio_player = None
+        AUDIO_FILE = info.audio
 
 
 def stop_audio():
-    # Stop audio if playing
-    if audio_proc and audio_proc.poll() is None:
-        print("Stopping audio...")
-        audio_proc.terminate()
-        try:
-            audio_proc.wait(timeout=1)
-        except subprocess.TimeoutExpired:
-            audio_proc.kill()
+    # Stop audio if playing and release the audio device
+    if audio_player:
+        audio_player.close()
 
 
-def cleanup_and_exit(*_):
+def cleanup():
+    # The controller has stopped, so nothing else owns the pins any more
     print("\nCleaning up GPIO...")
-    for pin in RELAY_PINS:
-        relay_off(pin)
+    relay_bank(0, ALL_RELAYS)
+    for line in relay_state.report(RELAY_PINS):
+        print(line)
     GPIO.cleanup()
+    SETUP_PINS.clear()
+    relay_state.forget()
+    dump_trace()
     stop_audio()
+    cue_log.stop()
     print("Exiting.")
-    sys.exit(0)
 
 
 def turn_everything_on():
     print("Turning everything ON")
-    for pin in RELAY_PINS:
-        relay_on(pin)
+    relays.write(ALL_RELAYS, 0)
 
 
 def turn_everything_off():
     print("Turning everything OFF")
-    for pin in RELAY_PINS:
-        relay_off(pin)
+    relays.write(0, ALL_RELAYS)
 
 
 def is_daytime():
-    """Check if current time is between 1:30 AM and 6:00 PM"""
-    now = datetime.now()
-    current_time = now.time()
-    start_time = datetime.strptime("01:30", "%H:%M").time()
-    end_time = datetime.strptime("11:00", "%H:%M").time()
-    return start_time <= current_time <= end_time
+    """Check if the current time falls in a DAYTIME window"""
+    return DAYTIME.is_active()
+
+
+def dump_trace(*_):
+    count = gpio_trace.dump(TRACE_FILE)
+    print(f"Saved {count} GPIO transitions to {TRACE_FILE}")
 
 
 def main():
-    # Handle Ctrl+C cleanly
-    signal.signal(signal.SIGINT, cleanup_and_exit)
-    signal.signal(signal.SIGTERM, cleanup_and_exit)
+    signal.signal(signal.SIGUSR1, dump_trace)
 
     # GPIO setup
     GPIO.setmode(GPIO.BCM)
     for pin in RELAY_PINS:
         GPIO.setup(pin, GPIO.OUT)
-        relay_off(pin)
+    SETUP_PINS.update(RELAY_PINS)
+    relay_bank(0, ALL_RELAYS)
+
+    tasks = [schedule()]
+    if BUTTON_PIN is not None:
+        inputs = InputEvents(GPIO)
+        inputs.add(Button(BUTTON_PIN, on_press=lambda button: controller.request_show()))
+        tasks.append(inputs.run())
+    if METRICS_ADDRESS is not None:
+        tasks.append(serve_metrics(METRICS_ADDRESS))
+
+    # Runs until SIGINT/SIGTERM (Ctrl+C), which cancels every task
+    try:
+        asyncio.run(controller.run(relays, *tasks))
+    finally:
+        cleanup()
+
+
+async def schedule():
+    global sync
+    if SYNC_ROLE == "follower":
+        sync = await open_follower(SYNC_LEADER, SYNC_PORT)
+    elif SYNC_ROLE == "leader":
+        sync = await open_leader(SYNC_PORT)
+
+    try:
+        if SYNC_ROLE == "follower":
+            await follow_leader()
+        else:
+            await day_and_night()
+    finally:
+        if sync is not None:
+            sync.close()
+
+
+async def follow_leader():
+    print(f"Following the show leader at {SYNC_LEADER}")
+    turn_everything_on()
+    # Start times are on the leader's clock; until a reply gives the offset
+    # to it, they cannot be told apart from hours in the future or past
+    await sync.synced.wait()
+    print(
+        f"Synced to the leader: offset {sync.offset * 1000:+.3f} ms, "
+        f"delay {sync.delay * 1000:.3f} ms"
+    )
+    while True:
+        start = await sync.next_show()
+        if start < sync.now():
+            print("Leader's show already started, skipping it")
+            continue
+        turn_everything_off()
+        await run_show(start)
+        turn_everything_on()
+
 
+async def day_and_night():
     turn_everything_on()
-    time.sleep(5)
+    await asyncio.sleep(5)
     turn_everything_off()
 
     while True:
+        iteration_start = time.monotonic()
         if is_daytime():
-            print("Daytime mode (1:30 AM - 6:00 PM): Lights staying on")
+            print(f"Daytime mode ({DAYTIME}): Lights staying on")
             turn_everything_on()
-            time.sleep(60)  # Check every minute
+            # Sleep until daytime ends, or start the show when the button is pressed
+            await controller.wait(DAYTIME.seconds_until_change())
+            if controller.take_show_request():
+                print("Button pressed: starting show")
+                turn_everything_off()
+                await asyncio.sleep(1)
+                await run_show()
         else:
             turn_everything_off()
-            time.sleep(1)
-            execute_light_audio_cues()
+            await asyncio.sleep(1)
+            await run_show()
             turn_everything_on()
-            time.sleep(30)
+            # A button press cuts the break short and starts the next show;
+            # daytime starting does too
+            await controller.wait(min(30, DAYTIME.seconds_until_change()))
             turn_everything_off()
-            time.sleep(3)
+            await asyncio.sleep(3)
+        loop_iteration.observe(time.monotonic() - iteration_start)
+
+
+async def run_show(start=None):
+    # start is the show's start on the shared timeline when running in sync;
+    # the leader picks it and tells the followers
+    if start is None and SYNC_ROLE == "leader":
+        start = sync.announce()
+    try:
+        if LIGHT_MODE == "envelope":
+            await execute_light_audio_envelope(start)
+        else:
+            await execute_light_audio_cues(start)
+    finally:
+        # Stop the audio if the show was cancelled part-way
+        get_audio_player().stop()
+    controller.take_show_request()
 
 
-def execute_light_audio_cues():
+async def execute_light_audio_cues(start=None):
     print("Starting monologue + light sync")
 
-    for pin in RELAY_PINS:
-        relay_off(pin)
-
-    # Start audio playback (non-blocking)
-    global audio_proc
-    audio_proc = subprocess.Popen(
-        ["aplay", AUDIO_FILE],
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
-    )
-
-    start_time = time.monotonic()
-
-    # Execute cues
-    for cue_time, pin, state in CUES:
-        # Busy-wait until the exact cue time
-        while time.monotonic() - start_time < cue_time:
-            time.sleep(0.001)
-
-        if state:
-            relay_on(pin)
-            action = "ON"
+    # Merge cues sharing a time into one bank write per frame
+    timeline = load_show()
+
+    relays.write(0, ALL_RELAYS)
+
+    def fire(i):
+        on_mask = timeline.on_masks[i]
+        off_mask = timeline.off_masks[i]
+        relays.write(on_mask, off_mask)
+        cues_fired.inc()
+
+        cue_time = timeline.times[i]
+        now = clock()
+        for pin in mask_pins(off_mask):
+            cue_log.record(i, cue_time, now, pin, False)
+        for pin in mask_pins(on_mask):
+            cue_log.record(i, cue_time, now, pin, True)
+
+    cue_log.start()
+    player = get_audio_player()
+    # Set up before the audio starts, as that is when the first cue is due
+    with realtime_profile() as profile:
+        if profile:
+            print(f"Real-time profile: {profile.describe()}")
+        if start is None:
+            # Start audio playback (non-blocking) and time the cues against it
+            player.play()
+            await audio_started(player)
+            if player.start_latency is not None:
+                audio_start_latency.observe(player.start_latency)
+                print(f"Audio started in {player.start_latency * 1000:.1f} ms")
+            clock = player.position
+            clock_source = player.clock_source
         else:
-            relay_off(pin)
-            action = "OFF"
-
-        print(f"{cue_time:6.2f}s | GPIO {pin} → {action}")
-
+            # Start with the other Pis and time the cues on the shared timeline
+            await wait_until_async(start, sync.now)
+            player.play()
+
+            def clock():
+                return sync.now() - start
+
+            clock_source = f"{sync.role} shared"
+        if profile:
+            profile.move_off(audio_worker(player))
+
+        # Sleep until just before each cue, then spin for the last stretch;
+        # other tasks run during the sleeps
+        show_start = time.monotonic()
+        lateness = await run_timeline_async(timeline.times, fire, clock=clock)
+
+    # Histogram after the show, so none of it happens between cues
+    for late in lateness:
+        cue_lateness.observe(late)
+    # The writer thread prints what is left; the loop never waits on stdout
+    cue_log.wake()
     print("All cues completed")
+    mean_late, max_late = summarize_lateness(lateness)
+    print(
+        f"Cue lateness ({clock_source} clock): "
+        f"mean {mean_late:.3f} ms, max {max_late:.3f} ms"
+    )
+    if clock_source == "alsa" and max_late > SYNC_TOLERANCE_MS:
+        print(f"WARNING: audio sync error above {SYNC_TOLERANCE_MS} ms")
     print("waiting for audio to finish...")
-    audio_proc.wait()
+    await asyncio.to_thread(player.wait)
+    print("Audio finished.")
+    record_show(player, show_start)
+    return lateness
+
+
+def record_show(player, show_start):
+    shows_played.inc()
+    show_duration.set(time.monotonic() - show_start)
+    # Only the in-process player knows how long its audio is
+    duration = getattr(player, "duration", None)
+    if duration is not None:
+        audio_duration.set(duration)
+
+
+async def execute_light_audio_envelope(start=None):
+    print("Starting monologue + envelope-following lights")
+
+    load_show()
+    relays.write(0, ALL_RELAYS)
+
+    show = EnvelopeShow(EnvelopeFollower(RELAY_PINS), relays.write)
+
+    # The player feeds every block to the show before it is played
+    player = get_audio_player()
+    if start is not None:
+        await wait_until_async(start, sync.now)
+    try:
+        player.play(on_block=show.on_block)
+    except OSError as e:
+        print(f"Envelope mode needs in-process audio ({e}), playing CUES instead")
+        return await execute_light_audio_cues(start)
+    await audio_started(player)
+    if player.start_latency is not None:
+        audio_start_latency.observe(player.start_latency)
+    show_start = time.monotonic()
+
+    with realtime_profile() as profile:
+        if profile:
+            print(f"Real-time profile: {profile.describe()}")
+            profile.move_off(audio_worker(player))
+        lateness = await show.run_async(player)
+
+    relays.write(0, ALL_RELAYS)
+    for late in lateness:
+        cue_lateness.observe(late)
+    mean_late, max_late = summarize_lateness(lateness)
+    print(
+        f"{len(lateness)} relay changes, sound to relay: "
+        f"mean {mean_late:.3f} ms, max {max_late:.3f} ms"
+    )
+    await asyncio.to_thread(player.wait)
     print("Audio finished.")
+    record_show(player, show_start)
+    return lateness
 
 
 if __name__ == "__main__":
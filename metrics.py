@@ -0,0 +1,198 @@
+"""In-process metrics with a Prometheus text endpoint.
+
+Counters, gauges and fixed-bucket histograms are plain Python objects
+updated in place: no locks, no allocation, a bisect over a handful of
+bucket bounds at most. Each metric is only ever updated from one thread
+(the controller's event loop), and the endpoint only reads them, so a
+scrape can at worst see a histogram whose count is one ahead of its
+buckets.
+
+serve() answers HTTP GETs on a local TCP port or Unix socket with the
+Prometheus text format, or gives up with a message if it cannot bind. It runs as a task on the same loop, so it only
+ever renders while the show is sleeping between cues:
+
+    curl -s localhost:9105/metrics
+    curl -s --unix-socket /run/rpi-lights.sock http://localhost/metrics
+"""
+
+import asyncio
+import bisect
+import math
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Seconds; fits everything from cue lateness to audio start
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0,
+)
+
+# How long serve() waits for a client to send its request
+REQUEST_TIMEOUT = 1.0
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class Counter:
+    """A value that only goes up"""
+
+    kind = "counter"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self):
+        return [(self.name, "", self.value)]
+
+
+class Gauge:
+    """A value that is set"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self):
+        return [(self.name, "", self.value)]
+
+
+class Histogram:
+    """Counts of observations in fixed buckets, plus their count and sum"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.bounds = tuple(sorted(buckets))
+        # One slot per bound plus +Inf; not cumulative until rendered
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        samples = []
+        total = 0
+        for bound, count in zip(self.bounds + (math.inf,), self.counts):
+            total += count
+            samples.append((self.name + "_bucket", f'{{le="{_format_value(bound)}"}}', total))
+        samples.append((self.name + "_sum", "", self.sum))
+        samples.append((self.name + "_count", "", total))
+        return samples
+
+
+class Callback:
+    """Values computed at scrape time by fn() -> {label value: value}"""
+
+    def __init__(self, name, help, kind, label, fn):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.label = label
+        self.fn = fn
+
+    def samples(self):
+        return [
+            (self.name, f'{{{self.label}="{key}"}}', value)
+            for key, value in sorted(self.fn().items())
+        ]
+
+
+class Registry:
+    """A named set of metrics, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def _add(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help):
+        return self._add(Counter(name, help))
+
+    def gauge(self, name, help):
+        return self._add(Gauge(name, help))
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help, buckets))
+
+    def callback(self, name, help, kind, label, fn):
+        return self._add(Callback(name, help, kind, label, fn))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# The registry main.py's metrics live in
+REGISTRY = Registry()
+
+
+async def _answer(registry, reader, writer):
+    try:
+        # Read the request head, whatever it asks for: there is one page
+        await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), REQUEST_TIMEOUT)
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+        pass
+    body = registry.render().encode()
+    writer.write(
+        b"HTTP/1.0 200 OK\r\n"
+        + f"Content-Type: {CONTENT_TYPE}\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+        + body
+    )
+    try:
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def serve(address, registry=REGISTRY):
+    """Serve registry on address: (host, port) for TCP or a Unix socket path.
+
+    If the address cannot be bound, says so and returns: the endpoint is
+    optional, and the tasks running beside it should not stop over it.
+    """
+
+    def handler(reader, writer):
+        return _answer(registry, reader, writer)
+
+    try:
+        if isinstance(address, str):
+            server = await asyncio.start_unix_server(handler, path=address)
+        else:
+            host, port = address
+            server = await asyncio.start_server(handler, host, port)
+    except OSError as e:
+        print(f"Metrics endpoint {address} not available: {e}")
+        return
+    async with server:
+        await server.serve_forever()
@@ -3,18 +3,47 @@
 import signal
 import sys
 import time
-from datetime import datetime
 
 import RPi.GPIO as GPIO
 
+from cue_log import CueLog
+from cue_scheduler import run_timeline, summarize_lateness
+from cue_timeline import compile_cues
+from day_schedule import Schedule, Window
+from gpio_bank import mask_pins, pin_mask, write_bank
+from gpio_trace import TRACE_CAPACITY, TraceRecorder, TracedGPIO
+from realtime import RealtimeProfile
+from relay_state import RelayState
+from show_library import ShowLibrary, use_relay_settings
+
 # from EmulatorGUI import GPIO
+# from EmulatorHeadless import GPIO
+# from MmapGPIO import GPIO
+# from ShiftGPIO import GPIO  # RELAY_PINS are then channels on the 74HC595 chain
+# from ArtNetGPIO import GPIO  # RELAY_PINS are then DMX channels (0 = universe 0 slot 1);
+#                               # set ACTIVE_LOW = False, or ON sends level 0
 
 
 # ===================== CONFIG =====================
 
+# Daytime windows: lights simply stay on and no show runs. Windows can
+# also use "sunrise"/"sunset" (e.g. "sunset-30") given latitude= and
+# longitude=; see day_schedule.py
+DAYTIME = Schedule([Window("01:30", "18:00")])
+
+# Play SHOWS_DIR/SHOW_NAME.show (see show_library.py) instead of the
+# ACTIVE_LOW/RELAY_PINS/CUES below; edits to the file are picked up
+# before the next show
+SHOW_NAME = None
+SHOWS_DIR = "shows"
+
 # True if your relay board turns ON when GPIO is LOW
 ACTIVE_LOW = True
 
+# Run the cues of each show with real-time priority, locked memory, a CPU
+# of their own and no GC pauses, as far as privileges allow; see realtime.py
+REALTIME = False
+
 
 LIGHT_1_PIN = 21  # GPIO21 (pin 40)
 LIGHT_2_PIN = 20  # GPIO20 (pin 38)
@@ -38,6 +67,13 @@ RELAY_PINS = [
     # LIGHT_8_PIN,
 ]
 
+# Bitmask of every relay pin, for switching them all in one bank write
+ALL_RELAYS = pin_mask(RELAY_PINS)
+
+# Every pin set up as an output since the last GPIO.cleanup(); backends
+# that track modes refuse to set one up twice
+SETUP_PINS = set()
+
 # Cue format:
 # (time_in_seconds_from_start, gpio_pin, state)
 # state: True = ON, False = OFF
@@ -64,60 +100,112 @@ CUES = [
 # ================================================
 
 
+# Last TRACE_CAPACITY output levels, logged by every GPIO output call
+gpio_trace = TraceRecorder(TRACE_CAPACITY)
+GPIO = TracedGPIO(GPIO, gpio_trace)
+
+# What every relay was last switched to, plus switch counts and on-time
+relay_state = RelayState()
+
+# Cue printouts, written by a thread of their own rather than between cues
+cue_log = CueLog()
+
+
 def relay_on(pin):
-    GPIO.output(pin, GPIO.LOW if ACTIVE_LOW else GPIO.HIGH)
+    relay_bank(1 << pin, 0)
 
 
 def relay_off(pin):
-    GPIO.output(pin, GPIO.HIGH if ACTIVE_LOW else GPIO.LOW)
+    relay_bank(0, 1 << pin)
+
+
+def relay_bank(on_mask, off_mask):
+    # Switch the relays in on_mask ON and those in off_mask OFF in one write,
+    # leaving out relays that are already that way
+    on_mask, off_mask = relay_state.changes(on_mask, off_mask)
+    if not on_mask and not off_mask:
+        return
+    if ACTIVE_LOW:
+        on_mask, off_mask = off_mask, on_mask
+    write_bank(GPIO, on_mask, off_mask)
+
+
+# Where the trace of every GPIO output is saved on exit or on SIGUSR1
+# (see gpio_trace.py to print, replay or diff it)
+TRACE_FILE = "gpio_trace.bin"
+
+# ShowLibrary of SHOWS_DIR, opened with the first show
+show_library = None
+
+
+def load_show():
+    """Return the Timeline of the next show, re-reading SHOW_NAME only if it changed"""
+    global show_library
+    if SHOW_NAME is None:
+        return compile_cues(CUES)
+
+    if show_library is None:
+        show_library = ShowLibrary(SHOWS_DIR)
+    for name in show_library.refresh():
+        print(f"Show {name} changed on disk")
+    info = show_library.load(SHOW_NAME).info
+
+    use_relay_settings(sys.modules[__name__], info, relay_bank)
+    return show_library.load(SHOW_NAME).timeline
 
 
 def cleanup_and_exit(*_):
     print("\nCleaning up GPIO...")
-    for pin in RELAY_PINS:
-        relay_off(pin)
+    relay_bank(0, ALL_RELAYS)
+    for line in relay_state.report(RELAY_PINS):
+        print(line)
     GPIO.cleanup()
+    SETUP_PINS.clear()
+    relay_state.forget()
+    dump_trace()
+    cue_log.stop()
     print("Exiting.")
     sys.exit(0)
 
 
 def turn_everything_on():
     print("Turning everything ON")
-    for pin in RELAY_PINS:
-        relay_on(pin)
+    relay_bank(ALL_RELAYS, 0)
 
 
 def turn_everything_off():
     print("Turning everything OFF")
-    for pin in RELAY_PINS:
-        relay_off(pin)
+    relay_bank(0, ALL_RELAYS)
 
 
 def is_daytime():
-    """Check if current time is between 1:30 AM and 6:00 PM"""
-    now = datetime.now()
-    current_time = now.time()
-    start_time = datetime.strptime("01:30", "%H:%M").time()
-    end_time = datetime.strptime("18:00", "%H:%M").time()
-    return start_time <= current_time <= end_time
+    """Check if the current time falls in a DAYTIME window"""
+    return DAYTIME.is_active()
+
+
+def dump_trace(*_):
+    count = gpio_trace.dump(TRACE_FILE)
+    print(f"Saved {count} GPIO transitions to {TRACE_FILE}")
 
 
 def main():
     # Handle Ctrl+C cleanly
     signal.signal(signal.SIGINT, cleanup_and_exit)
     signal.signal(signal.SIGTERM, cleanup_and_exit)
+    signal.signal(signal.SIGUSR1, dump_trace)
 
     # GPIO setup
     GPIO.setmode(GPIO.BCM)
     for pin in RELAY_PINS:
         GPIO.setup(pin, GPIO.OUT)
-        relay_off(pin)
+    SETUP_PINS.update(RELAY_PINS)
+    relay_bank(0, ALL_RELAYS)
 
     while True:
         if is_daytime():
-            print("Daytime mode (1:30 AM - 6:00 PM): Lights staying on")
+            print(f"Daytime mode ({DAYTIME}): Lights staying on")
             turn_everything_on()
-            time.sleep(60)  # Check every minute
+            time.sleep(DAYTIME.seconds_until_change())  # Until daytime ends
         else:
             turn_everything_off()
             time.sleep(1)
@@ -131,29 +219,44 @@ def main():
 def execute_light_audio_cues():
     print("Starting monologue + light sync")
 
-    for pin in RELAY_PINS:
-        relay_off(pin)
-
-    start_time = time.monotonic()
-
-    # Execute cues
-    for cue_time, pin, state in CUES:
-        # Busy-wait until the exact cue time
-        while time.monotonic() - start_time < cue_time:
-            time.sleep(0.001)
-
-        if state:
-            relay_on(pin)
-            action = "ON"
-        else:
-            relay_off(pin)
-            action = "OFF"
-
-        print(f"{cue_time:6.2f}s | GPIO {pin} → {action}")
-
+    # Merge cues sharing a time into one bank write per frame
+    timeline = load_show()
+
+    relay_bank(0, ALL_RELAYS)
+
+    def fire(i):
+        on_mask = timeline.on_masks[i]
+        off_mask = timeline.off_masks[i]
+        relay_bank(on_mask, off_mask)
+
+        cue_time = timeline.times[i]
+        now = clock()
+        for pin in mask_pins(off_mask):
+            cue_log.record(i, cue_time, now, pin, False)
+        for pin in mask_pins(on_mask):
+            cue_log.record(i, cue_time, now, pin, True)
+
+    def clock():
+        return time.monotonic() - show_start
+
+    cue_log.start()
+    # Sleep until just before each cue, then spin for the last stretch
+    if REALTIME:
+        with RealtimeProfile() as profile:
+            print(f"Real-time profile: {profile.describe()}")
+            show_start = time.monotonic()
+            lateness = run_timeline(timeline.times, fire, clock=clock)
+    else:
+        show_start = time.monotonic()
+        lateness = run_timeline(timeline.times, fire, clock=clock)
+
+    cue_log.flush()
     print("All cues completed")
+    mean_late, max_late = summarize_lateness(lateness)
+    print(f"Cue lateness: mean {mean_late:.3f} ms, max {max_late:.3f} ms")
 
     print("Audio finished.")
+    return lateness
 
 
 if __name__ == "__main__":
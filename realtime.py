@@ -0,0 +1,152 @@
+"""Real-time profile for the stretch of a show where cues fire.
+
+Cue lateness on a Pi comes less from our own code than from everything
+around it: another process scheduled on our core, a page fault on memory
+that was swapped or never touched, a cyclic garbage collection landing
+between two cues. RealtimeProfile takes those away for as long as it is
+entered:
+
+    - the calling thread runs SCHED_FIFO, so it preempts normal processes
+    - all memory is locked (mlockall), so nothing faults mid-show
+    - the calling thread is pinned to one CPU and, via move_off(), the
+      audio worker to the others, so the spin before a cue never competes
+      with the audio
+    - the GC is run once, its survivors frozen and collection disabled
+
+Each step needs privileges the process may not have (root, or
+CAP_SYS_NICE/CAP_IPC_LOCK and matching rlimits). A step that fails is
+skipped and reported in describe(); the show plays either way. Leaving
+the profile undoes every step that was applied.
+"""
+
+import ctypes
+import ctypes.util
+import gc
+import os
+
+# Below threaded interrupt handlers (50), so the GPIO and audio drivers
+# still get in ahead of the cue loop
+RT_PRIORITY = 40
+
+_MCL_CURRENT = 1
+_MCL_FUTURE = 2
+
+
+def _libc():
+    name = ctypes.util.find_library("c")
+    return ctypes.CDLL(name, use_errno=True)
+
+
+class RealtimeProfile:
+    """Context manager applying as much of the real-time setup as allowed.
+
+    cpu is the CPU to pin the calling thread to (default: the last one it
+    may run on). Setting up takes a few milliseconds (the GC pass, locking
+    every page), so enter it before the clock of the show starts.
+    """
+
+    def __init__(self, priority=RT_PRIORITY, cpu=None, lock_memory=True, freeze_gc=True):
+        self.priority = priority
+        self.cpu = cpu
+        self.lock_memory = lock_memory
+        self.freeze_gc = freeze_gc
+        # What was applied, and (step, reason) for what was not
+        self.applied = []
+        self.skipped = []
+        self._undo = []
+        # CPUs the calling thread was allowed before it was pinned, and its CPU
+        self._allowed = None
+        self._cpu = None
+
+    def __enter__(self):
+        self.applied = []
+        self.skipped = []
+        self._undo = []
+        self._try("SCHED_FIFO", self._set_scheduler)
+        if self.lock_memory:
+            self._try("mlockall", self._lock_memory)
+        self._try("CPU affinity", self._pin)
+        if self.freeze_gc:
+            self._freeze_gc()
+        return self
+
+    def __exit__(self, *exc_info):
+        for undo in reversed(self._undo):
+            try:
+                undo()
+            except OSError:
+                pass
+        self._undo = []
+        self._allowed = None
+
+    def move_off(self, tid):
+        """Keep thread or process tid (e.g. the audio worker) off our CPU"""
+        if tid is None or self._allowed is None:
+            return
+        try:
+            before = os.sched_getaffinity(tid)
+            os.sched_setaffinity(tid, self._allowed - {self._cpu})
+        except OSError:
+            return
+        self._undo.append(lambda: os.sched_setaffinity(tid, before))
+
+    def describe(self):
+        """One line saying what the profile did"""
+        text = ", ".join(self.applied) or "nothing applied"
+        if self.skipped:
+            text += "; skipped " + ", ".join(f"{step} ({reason})" for step, reason in self.skipped)
+        return text
+
+    def _try(self, step, apply):
+        try:
+            apply()
+        except (OSError, AttributeError) as e:
+            # AttributeError: os has no sched_* off Linux
+            self.skipped.append((step, e.strerror if isinstance(e, OSError) and e.strerror else str(e)))
+
+    def _set_scheduler(self):
+        policy = os.sched_getscheduler(0)
+        param = os.sched_getparam(0)
+        # Processes we start, e.g. aplay, go back to the normal policy
+        fifo = os.SCHED_FIFO | getattr(os, "SCHED_RESET_ON_FORK", 0)
+        os.sched_setscheduler(0, fifo, os.sched_param(self.priority))
+        self._undo.append(lambda: os.sched_setscheduler(0, policy, param))
+        self.applied.append(f"SCHED_FIFO {self.priority}")
+
+    def _lock_memory(self):
+        libc = _libc()
+        if libc.mlockall(_MCL_CURRENT | _MCL_FUTURE) != 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._undo.append(libc.munlockall)
+        self.applied.append("memory locked")
+
+    def _pin(self):
+        allowed = os.sched_getaffinity(0)
+        if len(allowed) < 2:
+            raise OSError(0, "only one CPU")
+        cpu = max(allowed) if self.cpu is None else self.cpu
+        if cpu not in allowed:
+            raise OSError(0, f"CPU {cpu} not available")
+
+        os.sched_setaffinity(0, {cpu})
+        self._undo.append(lambda: os.sched_setaffinity(0, allowed))
+        self._allowed = allowed
+        self._cpu = cpu
+        self.applied.append(f"CPU {cpu}")
+
+    def _freeze_gc(self):
+        # Collect now, before the first cue, and keep everything that is
+        # left out of later collections
+        was_enabled = gc.isenabled()
+        gc.collect()
+        gc.freeze()
+        gc.disable()
+
+        def undo():
+            gc.unfreeze()
+            if was_enabled:
+                gc.enable()
+
+        self._undo.append(undo)
+        self.applied.append("GC frozen")
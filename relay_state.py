@@ -0,0 +1,85 @@
+"""Shadow copy of the relay outputs.
+
+RelayState remembers what every relay was last switched to, so a bank
+write can be cut down to the relays that actually change, and nothing at
+all goes out when nothing does (the daytime "everything ON" every few
+minutes, a cue for a light that is already on). The same bookkeeping
+gives wear data: how often each relay has switched and how long it has
+been on.
+
+Relays start out unknown and are written the first time whatever they
+are asked to be; forget() makes them unknown again, e.g. after
+GPIO.cleanup().
+"""
+
+import time
+
+from gpio_bank import mask_pins
+
+
+class RelayState:
+    """Logical state (bit n set = relay on GPIO n is ON) plus wear counters"""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.on_mask = 0
+        self.known_mask = 0
+        self._actuations = {}
+        self._on_time = {}
+        self._on_since = {}
+
+    def forget(self):
+        """Treat every relay as unknown, so the next write sets it for sure"""
+        now = self.clock()
+        for pin in list(self._on_since):
+            self._add_on_time(pin, now)
+        self.on_mask = 0
+        self.known_mask = 0
+
+    def changes(self, on_mask, off_mask):
+        """Record a requested write; return the (on_mask, off_mask) that changes anything"""
+        known = self.known_mask
+        current = self.on_mask
+        on_mask &= ~(current & known)
+        off_mask &= ~(~current & known)
+        if not on_mask and not off_mask:
+            return 0, 0
+
+        now = self.clock()
+        # Relays leaving a known state have switched; unknown ones just
+        # become known
+        for pin in mask_pins((on_mask | off_mask) & known):
+            self._actuations[pin] = self._actuations.get(pin, 0) + 1
+        for pin in mask_pins(on_mask):
+            self._on_since[pin] = now
+        for pin in mask_pins(off_mask):
+            self._add_on_time(pin, now)
+
+        self.on_mask = (current | on_mask) & ~off_mask
+        self.known_mask = known | on_mask | off_mask
+        return on_mask, off_mask
+
+    def _add_on_time(self, pin, now):
+        since = self._on_since.pop(pin, None)
+        if since is not None:
+            self._on_time[pin] = self._on_time.get(pin, 0.0) + now - since
+
+    def actuations(self, pin):
+        """Times the relay on pin has switched ON or OFF"""
+        return self._actuations.get(pin, 0)
+
+    def on_time(self, pin):
+        """Seconds the relay on pin has been ON, including right now"""
+        total = self._on_time.get(pin, 0.0)
+        since = self._on_since.get(pin)
+        if since is not None:
+            total += self.clock() - since
+        return total
+
+    def report(self, pins):
+        """One line of wear data per pin"""
+        return [
+            f"GPIO {pin}: {self.actuations(pin)} switches, "
+            f"on for {self.on_time(pin) / 3600:.2f} h"
+            for pin in pins
+        ]
@@ -0,0 +1,145 @@
+"""Asyncio controller for the light show.
+
+The day/night schedule, the show itself, button events and signal
+handling all run as tasks on one event loop. Waiting is awaiting, so a
+button press, a shutdown signal or a schedule change is acted on within a
+loop iteration instead of after whatever time.sleep() was running.
+
+The relays have a single owner, PinWriter, and every (on_mask, off_mask)
+write goes through it in order: directly from tasks on the loop, through
+its queue from other threads (write_threadsafe).
+
+    relays = PinWriter(relay_bank)
+    controller = ShowController()
+    asyncio.run(controller.run(relays, schedule(), inputs.run()))
+"""
+
+import asyncio
+import signal
+
+
+class PinWriter:
+    """Single owner of the relay pins"""
+
+    def __init__(self, write):
+        self._write = write
+        self._loop = None
+        self._queue = None
+        self._task = None
+
+    def write(self, on_mask, off_mask):
+        """Apply a bank write from the event loop's thread.
+
+        Tasks on the loop never run concurrently, so the write goes straight
+        to the pins unless writes from other threads are still queued; a cue
+        is not held back until its task next yields.
+        """
+        if self._task is None:
+            raise RuntimeError("PinWriter.write() used outside 'async with'")
+        if self._task.done():
+            # Surface a failed GPIO write to whoever is writing next
+            self._task.result()
+        if self._queue.empty():
+            self._write(on_mask, off_mask)
+        else:
+            self._queue.put_nowait((on_mask, off_mask))
+
+    def write_threadsafe(self, on_mask, off_mask):
+        """Queue a bank write from any thread"""
+        if self._task is None:
+            raise RuntimeError("PinWriter.write_threadsafe() used outside 'async with'")
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (on_mask, off_mask))
+
+    async def drain(self):
+        """Wait until every queued write has reached the pins"""
+        join = asyncio.ensure_future(self._queue.join())
+        await asyncio.wait((join, self._task), return_when=asyncio.FIRST_COMPLETED)
+        join.cancel()
+        if self._task.done():
+            self._task.result()
+
+    async def _run(self):
+        queue = self._queue
+        write = self._write
+        while True:
+            on_mask, off_mask = await queue.get()
+            try:
+                write(on_mask, off_mask)
+            finally:
+                queue.task_done()
+
+    async def __aenter__(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc_info):
+        try:
+            await self.drain()
+        finally:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class ShowController:
+    """Runs a set of tasks until SIGINT/SIGTERM and wakes them on request"""
+
+    def __init__(self):
+        self._loop = None
+        self._wakeup = None
+        self._tasks = []
+        self._show_requested = False
+
+    def request_show(self):
+        """Ask for a show as soon as possible; safe from any thread"""
+        self._loop.call_soon_threadsafe(self._request_show)
+
+    def _request_show(self):
+        self._show_requested = True
+        self._wakeup.set()
+
+    def take_show_request(self):
+        """Return whether a show was requested, and forget the request"""
+        requested = self._show_requested
+        self._show_requested = False
+        return requested
+
+    def wake(self):
+        """End the current wait() early, e.g. after the schedule changed"""
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def wait(self, timeout):
+        """Sleep up to timeout seconds; return True if woken early"""
+        self._wakeup.clear()
+        if self._show_requested:
+            return True
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except TimeoutError:
+            return False
+        return True
+
+    def stop(self):
+        """Cancel every task; run() returns once they have unwound"""
+        for task in self._tasks:
+            task.cancel()
+
+    async def run(self, relays, *coros):
+        """Run coros as tasks while relays owns the pins, until stop()"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            self._loop.add_signal_handler(signum, self.stop)
+        try:
+            async with relays:
+                async with asyncio.TaskGroup() as group:
+                    self._tasks = [group.create_task(coro) for coro in coros]
+        finally:
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                self._loop.remove_signal_handler(signum)
+            self._tasks = []
@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""Show library: shows as files instead of module constants.
+
+A show is authored as text, NAME.show:
+
+    # Hall monologue
+    audio: actual_monologue_boosted.wav
+    pins: 6 19 26 5 16
+    active_low: no
+
+    cues:
+    0:00    6   on      # times in seconds, or m:ss(.ff)
+    0:47    6   off
+    0:48    19  on
+
+and compiled to NAME.showc: a small JSON header followed by the frames of
+the compiled timeline as raw arrays, so loading one is a few
+array.frombytes() calls. Shows using channels above 63 have masks too
+wide for a machine word; those are stored as fixed-width little-endian
+integers, "mask_bytes" each, as given in the header. The library writes the compiled form next to the
+text the first time a show is loaded and uses it for as long as the text
+is unchanged.
+
+index() lists every show from the headers alone (everything above
+"cues:", or the JSON of a compiled show) and load() parses or reads a
+show only when it is about to play. Both cache per file and only look at
+a file again once it has changed; refresh() finds out which ones did,
+from inotify where available, else by comparing stat() results.
+
+    python show_library.py list shows
+    python show_library.py compile shows
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import json
+import os
+import struct
+import sys
+from array import array
+
+from cue_timeline import Timeline, compile_cues
+from gpio_bank import pin_mask
+
+SHOW_SUFFIX = ".show"
+COMPILED_SUFFIX = ".showc"
+
+_MAGIC = b"RPSHOW\x00\x01"
+_LENGTH = struct.Struct("<I")
+
+# inotify event bits, from <sys/inotify.h>
+_IN_MODIFY = 0x002
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_NONBLOCK = 0o4000
+_IN_EVENT = struct.Struct("iIII")
+
+
+class ShowInfo:
+    """What the index knows about a show, from its header only"""
+
+    def __init__(self, name, path, audio=None, pins=(), active_low=False, title=None,
+                 frames=None, duration=None):
+        self.name = name
+        self.path = path
+        self.audio = audio
+        self.pins = list(pins)
+        self.active_low = active_low
+        self.title = title
+        self.frames = frames
+        self.duration = duration
+
+    def header(self):
+        return {
+            "audio": self.audio,
+            "pins": self.pins,
+            "active_low": self.active_low,
+            "title": self.title,
+            "frames": self.frames,
+            "duration": self.duration,
+        }
+
+
+class Show:
+    """A loaded show: its ShowInfo and compiled Timeline"""
+
+    def __init__(self, info, timeline):
+        self.info = info
+        self.timeline = timeline
+
+    @property
+    def name(self):
+        return self.info.name
+
+
+def _parse_bool(text, where):
+    value = text.strip().lower()
+    if value in ("yes", "true", "on", "1"):
+        return True
+    if value in ("no", "false", "off", "0"):
+        return False
+    raise ValueError(f"{where}: expected yes/no, got {text!r}")
+
+
+def _parse_time(text, where):
+    try:
+        if ":" in text:
+            minutes, seconds = text.split(":")
+            return int(minutes) * 60 + float(seconds)
+        return float(text)
+    except ValueError:
+        raise ValueError(f"{where}: invalid time {text!r}") from None
+
+
+def _lines(f, path):
+    # (where, text) of every non-blank line with its comment removed
+    for number, line in enumerate(f, 1):
+        text = line.split("#", 1)[0].strip()
+        if text:
+            yield f"{path}:{number}", text
+
+
+def _read_header(lines, info):
+    # Fill info from "key: value" lines up to "cues:"
+    for where, text in lines:
+        key, sep, value = text.partition(":")
+        key = key.strip().lower()
+        if not sep:
+            raise ValueError(f"{where}: expected 'key: value', got {text!r}")
+        if key == "cues":
+            return
+        if key == "audio":
+            info.audio = value.strip() or None
+        elif key == "pins":
+            info.pins = [int(pin) for pin in value.split()]
+        elif key == "active_low":
+            info.active_low = _parse_bool(value, where)
+        elif key == "title":
+            info.title = value.strip()
+        else:
+            raise ValueError(f"{where}: unknown setting {key!r}")
+
+
+def read_text_header(path):
+    """ShowInfo from the header of a text show, without reading its cues"""
+    info = ShowInfo(_show_name(path), path)
+    with open(path, encoding="utf-8") as f:
+        _read_header(_lines(f, path), info)
+    return info
+
+
+def read_text_show(path):
+    """Parse a text show into a Show"""
+    info = ShowInfo(_show_name(path), path)
+    cues = []
+    with open(path, encoding="utf-8") as f:
+        lines = _lines(f, path)
+        _read_header(lines, info)
+        for where, text in lines:
+            fields = text.split()
+            if len(fields) != 3:
+                raise ValueError(f"{where}: expected 'time pin on|off', got {text!r}")
+            pin = int(fields[1])
+            if info.pins and pin not in info.pins:
+                raise ValueError(f"{where}: GPIO {pin} is not in pins")
+            cues.append((_parse_time(fields[0], where), pin, _parse_bool(fields[2], where)))
+
+    timeline = compile_cues(cues)
+    info.frames = len(timeline)
+    info.duration = timeline.duration()
+    return Show(info, timeline)
+
+
+def write_compiled(show, path, source_stamp=None):
+    """Write show to path in the compiled form"""
+    timeline = show.timeline
+    header = show.info.header()
+    header["source"] = source_stamp
+    wide = not isinstance(timeline.on_masks, array)
+    if wide:
+        widest = max(max(timeline.on_masks, default=0), max(timeline.off_masks, default=0))
+        header["mask_bytes"] = mask_bytes = max(1, (widest.bit_length() + 7) // 8)
+    header = json.dumps(header).encode()
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_MAGIC + _LENGTH.pack(len(header)) + header)
+        for values in (timeline.times, timeline.on_masks, timeline.off_masks):
+            if not isinstance(values, array):
+                f.write(b"".join(mask.to_bytes(mask_bytes, "little") for mask in values))
+                continue
+            if sys.byteorder != "little":
+                values = array(values.typecode, values)
+                values.byteswap()
+            values.tofile(f)
+    os.replace(tmp, path)
+
+
+def _read_compiled_header(f, path):
+    if f.read(len(_MAGIC)) != _MAGIC:
+        raise ValueError(f"{path} is not a compiled show")
+    (length,) = _LENGTH.unpack(f.read(_LENGTH.size))
+    header = json.loads(f.read(length))
+    info = ShowInfo(
+        _show_name(path), path, header["audio"], header["pins"], header["active_low"],
+        header["title"], header["frames"], header["duration"],
+    )
+    return info, header
+
+
+def read_compiled_header(path):
+    """ShowInfo of a compiled show and the stamp of the text it came from"""
+    with open(path, "rb") as f:
+        info, header = _read_compiled_header(f, path)
+    return info, header.get("source")
+
+
+def read_compiled_show(path):
+    """Load a compiled show"""
+    with open(path, "rb") as f:
+        info, header = _read_compiled_header(f, path)
+        mask_bytes = header.get("mask_bytes")
+        arrays = []
+        for typecode in ("d", "Q", "Q"):
+            if typecode == "Q" and mask_bytes is not None:
+                data = f.read(mask_bytes * info.frames)
+                if len(data) != mask_bytes * info.frames:
+                    raise ValueError(f"{path} is truncated")
+                arrays.append([
+                    int.from_bytes(data[i:i + mask_bytes], "little")
+                    for i in range(0, len(data), mask_bytes)
+                ])
+                continue
+            values = array(typecode)
+            values.fromfile(f, info.frames)
+            if sys.byteorder != "little":
+                values.byteswap()
+            arrays.append(values)
+    return Show(info, Timeline(*arrays))
+
+
+def _show_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _stamp(path):
+    # Changes whenever the file is rewritten; None if it is gone
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+class _Inotify:
+    """Non-blocking inotify watch on one directory, through libc"""
+
+    def __init__(self, directory):
+        name = ctypes.util.find_library("c")
+        libc = ctypes.CDLL(name, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self.fd = libc.inotify_init1(_IN_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, f"inotify_add_watch failed on {directory}")
+
+    def changed(self):
+        """Names of files changed since the last call"""
+        names = set()
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return names
+            offset = 0
+            while offset < len(data):
+                _, _, _, length = _IN_EVENT.unpack_from(data, offset)
+                offset += _IN_EVENT.size
+                names.add(os.fsdecode(data[offset : offset + length].rstrip(b"\0")))
+                offset += length
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ShowLibrary:
+    """Shows in one directory, indexed from headers and loaded on demand"""
+
+    def __init__(self, directory, watch=True):
+        self.directory = directory
+        self._infos = {}
+        self._shows = {}
+        self._stamps = {}
+        self._watch = None
+        if watch:
+            try:
+                self._watch = _Inotify(directory)
+            except OSError as e:
+                print(f"Show library: no change notification ({e}), checking files instead")
+
+    def _source(self, name):
+        # Path a show is read from: its text, or a compiled file on its own
+        text = os.path.join(self.directory, name + SHOW_SUFFIX)
+        if os.path.exists(text):
+            return text
+        return os.path.join(self.directory, name + COMPILED_SUFFIX)
+
+    def names(self):
+        names = set()
+        for entry in os.listdir(self.directory):
+            stem, suffix = os.path.splitext(entry)
+            if suffix in (SHOW_SUFFIX, COMPILED_SUFFIX):
+                names.add(stem)
+        return sorted(names)
+
+    def index(self):
+        """{name: ShowInfo} of every show, reading headers only"""
+        infos = {}
+        for name in self.names():
+            info = self._infos.get(name)
+            if info is None:
+                info = self._read_info(name)
+                self._infos[name] = info
+                self._stamps[name] = _stamp(info.path)
+            infos[name] = info
+        return infos
+
+    def _read_info(self, name):
+        path = self._source(name)
+        if path.endswith(COMPILED_SUFFIX):
+            return read_compiled_header(path)[0]
+        compiled = os.path.join(self.directory, name + COMPILED_SUFFIX)
+        try:
+            info, source = read_compiled_header(compiled)
+        except (OSError, ValueError):
+            return read_text_header(path)
+        if source != _stamp(path):
+            return read_text_header(path)
+        # Up to date, and the compiled header knows frames and duration
+        info.path = path
+        return info
+
+    def load(self, name):
+        """The Show called name, parsed (or read compiled) only if it changed"""
+        show = self._shows.get(name)
+        if show is not None:
+            return show
+
+        path = self._source(name)
+        if not os.path.exists(path):
+            raise KeyError(f"No show {name!r} in {self.directory}")
+        stamp = _stamp(path)
+        if path.endswith(COMPILED_SUFFIX):
+            show = read_compiled_show(path)
+        else:
+            show = self._load_text(name, path, stamp)
+
+        self._shows[name] = show
+        self._infos[name] = show.info
+        self._stamps[name] = stamp
+        return show
+
+    def _load_text(self, name, path, stamp):
+        compiled = os.path.join(self.directory, name + COMPILED_SUFFIX)
+        try:
+            _, source = read_compiled_header(compiled)
+            if source == stamp:
+                show = read_compiled_show(compiled)
+                show.info.path = path
+                return show
+        except (OSError, ValueError):
+            pass
+
+        show = read_text_show(path)
+        try:
+            write_compiled(show, compiled, stamp)
+        except OSError as e:
+            print(f"Could not save compiled show {compiled}: {e}")
+        return show
+
+    def refresh(self):
+        """Forget shows whose files changed; return their names"""
+        if self._watch is not None:
+            names = {
+                _show_name(entry)
+                for entry in self._watch.changed()
+                if entry.endswith((SHOW_SUFFIX, COMPILED_SUFFIX))
+            }
+        else:
+            names = {
+                name for name, stamp in self._stamps.items()
+                if _stamp(self._source(name)) != stamp
+            }
+            names.update(set(self.names()) - set(self._stamps))
+
+        changed = set()
+        for name in names:
+            if name in self._stamps and _stamp(self._source(name)) == self._stamps[name]:
+                # Only the compiled file we wrote ourselves
+                continue
+            self._infos.pop(name, None)
+            self._shows.pop(name, None)
+            self._stamps.pop(name, None)
+            changed.add(name)
+        return changed
+
+    def close(self):
+        if self._watch is not None:
+            self._watch.close()
+            self._watch = None
+
+
+def use_relay_settings(show, info, write):
+    """Rewire show (the main or only_lights module) to info's relay pins and polarity.
+
+    write(set_mask, clear_mask) switches relays and must follow the
+    module's ACTIVE_LOW. Only pins missing from the module's SETUP_PINS
+    are set up, as backends that track modes refuse a second setup().
+    """
+    pins = info.pins or show.RELAY_PINS
+    if pins == show.RELAY_PINS and info.active_low == show.ACTIVE_LOW:
+        return
+    print(f"Relays: GPIO {' '.join(map(str, pins))}, active_low={info.active_low}")
+    write(0, show.ALL_RELAYS)
+    show.RELAY_PINS = pins
+    show.ALL_RELAYS = pin_mask(pins)
+    show.ACTIVE_LOW = info.active_low
+    for pin in pins:
+        if pin not in show.SETUP_PINS:
+            show.GPIO.setup(pin, show.GPIO.OUT)
+            show.SETUP_PINS.add(pin)
+    # A polarity change inverts what every pin means
+    show.relay_state.forget()
+    write(0, show.ALL_RELAYS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=("list", "compile"))
+    parser.add_argument("directory", nargs="?", default="shows")
+    args = parser.parse_args()
+
+    library = ShowLibrary(args.directory, watch=False)
+    if args.command == "compile":
+        for name in library.names():
+            show = library.load(name)
+            print(f"{name}: {len(show.timeline)} frames")
+        return
+
+    for name, info in library.index().items():
+        length = "?" if info.duration is None else f"{info.duration:.1f} s"
+        print(f"{name:<20} {length:>9}  pins {' '.join(map(str, info.pins))}"
+              f"  audio {info.audio or '-'}  {info.title or ''}")
+
+
+if __name__ == "__main__":
+    main()
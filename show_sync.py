@@ -0,0 +1,192 @@
+"""Keep shows on several Pis in step over the LAN.
+
+One node is the leader; its monotonic clock is the shared timeline.
+Followers estimate their offset from it with an NTP-style exchange over
+UDP, once a second:
+
+    follower                          leader
+    t1 = send time   -- REQUEST -->
+                                      t2 = receive time
+                     <-- REPLY  --    t3 = send time
+    t4 = receive time
+
+    offset = ((t2 - t1) + (t3 - t4)) / 2
+    delay  = (t4 - t1) - (t3 - t2)
+
+Of the last few samples the one with the smallest round trip wins, as in
+NTP's clock filter, since queueing delay only ever adds to it.
+
+The leader announces each show as a start time on the shared timeline a
+little ahead of now, and every node runs the show against
+SyncLeader.now()/SyncFollower.now() minus that start. Both sides run as
+protocols on the controller's event loop.
+"""
+
+import asyncio
+import collections
+import struct
+import time
+
+SYNC_PORT = 5005
+
+# How often followers measure their offset
+SYNC_INTERVAL = 1.0
+
+# Round trips kept for choosing the offset
+SYNC_SAMPLES = 8
+
+# Followers not heard from for this long are dropped by the leader
+FOLLOWER_TIMEOUT = 10.0
+
+# How far ahead of now the leader schedules a show start
+SHOW_LEAD = 1.0
+
+# Each announcement is sent this many times; followers ignore repeats
+ANNOUNCE_COPIES = 3
+
+_MAGIC = b"RPLS"
+_REQUEST = 1
+_REPLY = 2
+_SHOW = 3
+
+_HEADER = struct.Struct("!4sB")
+_REQUEST_BODY = struct.Struct("!d")
+_REPLY_BODY = struct.Struct("!ddd")
+_SHOW_BODY = struct.Struct("!Qd")
+
+
+def _unpack(data):
+    # (kind, fields) of a message, or (None, None) for anything else
+    if len(data) < _HEADER.size:
+        return None, None
+    magic, kind = _HEADER.unpack_from(data)
+    body = {_REQUEST: _REQUEST_BODY, _REPLY: _REPLY_BODY, _SHOW: _SHOW_BODY}.get(kind)
+    if magic != _MAGIC or body is None or len(data) != _HEADER.size + body.size:
+        return None, None
+    return kind, body.unpack_from(data, _HEADER.size)
+
+
+class SyncLeader(asyncio.DatagramProtocol):
+    """Answers clock requests and announces shows to every follower"""
+
+    role = "leader"
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.transport = None
+        self.followers = {}
+        # Not reset to 0 so a restarted leader's shows are not taken for repeats
+        self.show_id = time.time_ns()
+
+    def now(self):
+        """Current time on the shared timeline"""
+        return self.clock()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        received = self.clock()
+        kind, fields = _unpack(data)
+        if kind != _REQUEST:
+            return
+        self.followers[addr] = received
+        reply = _HEADER.pack(_MAGIC, _REPLY) + _REPLY_BODY.pack(fields[0], received, self.clock())
+        self.transport.sendto(reply, addr)
+
+    def announce(self, lead=SHOW_LEAD):
+        """Tell the followers a show starts lead seconds from now; return its start"""
+        start = self.now() + lead
+        self.show_id += 1
+        message = _HEADER.pack(_MAGIC, _SHOW) + _SHOW_BODY.pack(self.show_id, start)
+
+        now = self.clock()
+        for addr, last_seen in list(self.followers.items()):
+            if now - last_seen > FOLLOWER_TIMEOUT:
+                del self.followers[addr]
+                continue
+            for _ in range(ANNOUNCE_COPIES):
+                self.transport.sendto(message, addr)
+        return start
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+
+class SyncFollower(asyncio.DatagramProtocol):
+    """Tracks the leader's clock and receives its show announcements"""
+
+    role = "follower"
+
+    def __init__(self, clock=time.monotonic, samples=SYNC_SAMPLES):
+        self.clock = clock
+        self.transport = None
+        # (delay, offset) of recent round trips
+        self.samples = collections.deque(maxlen=samples)
+        self.offset = 0.0
+        self.delay = None
+        self.synced = asyncio.Event()
+        self._shows = asyncio.Queue()
+        self._last_show = 0
+        self._poller = None
+
+    def now(self):
+        """Current time on the shared timeline"""
+        return self.clock() + self.offset
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self._poller = asyncio.create_task(self._poll())
+
+    def connection_lost(self, exc):
+        if self._poller is not None:
+            self._poller.cancel()
+
+    async def _poll(self):
+        request = _HEADER.pack(_MAGIC, _REQUEST)
+        while True:
+            self.transport.sendto(request + _REQUEST_BODY.pack(self.clock()))
+            await asyncio.sleep(SYNC_INTERVAL)
+
+    def datagram_received(self, data, addr):
+        received = self.clock()
+        kind, fields = _unpack(data)
+        if kind == _REPLY:
+            sent, leader_received, leader_sent = fields
+            delay = (received - sent) - (leader_sent - leader_received)
+            offset = ((leader_received - sent) + (leader_sent - received)) / 2
+            self.samples.append((delay, offset))
+            self.delay, self.offset = min(self.samples)
+            self.synced.set()
+        elif kind == _SHOW:
+            show_id, start = fields
+            if show_id != self._last_show:
+                self._last_show = show_id
+                self._shows.put_nowait(start)
+
+    async def next_show(self):
+        """Wait for the leader's next announcement; return its shared start time"""
+        return await self._shows.get()
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+
+async def open_leader(port=SYNC_PORT, host="0.0.0.0", clock=time.monotonic):
+    """Start a SyncLeader listening on host:port"""
+    loop = asyncio.get_running_loop()
+    _, leader = await loop.create_datagram_endpoint(
+        lambda: SyncLeader(clock), local_addr=(host, port)
+    )
+    return leader
+
+
+async def open_follower(leader_host, port=SYNC_PORT, clock=time.monotonic):
+    """Start a SyncFollower of the leader at leader_host:port"""
+    loop = asyncio.get_running_loop()
+    _, follower = await loop.create_datagram_endpoint(
+        lambda: SyncFollower(clock), remote_addr=(leader_host, port)
+    )
+    return follower
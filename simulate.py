@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""Run main.py's whole day/night schedule on a virtual clock.
+
+main.main() runs unchanged on a VirtualEventLoop (see virtual_clock.py)
+with the recording GPIO stand-in and a silent player, so the startup
+flash, every show, the breaks between them and the DAYTIME boundaries
+all happen as scheduled, only without waiting for them: a day takes
+well under a second. Every relay change is taken from main's GPIO trace
+and written out as a timeline, which is exact and repeatable, so two
+runs can be diffed:
+
+    python simulate.py --start "2026-06-21 00:00" --hours 24 --timeline day.txt
+    python simulate.py --start "2026-06-21 00:00" --hours 24 --compare day.txt
+    python simulate.py --hours 2 --press 12:05 --verbose
+
+main's time.monotonic()/time.time()/time.sleep(), the DAYTIME schedule,
+the relay wear counters and the trace all read the virtual clock.
+Sync, metrics, the button input and envelope mode are left out: they
+need a network, a socket or real audio.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import difflib
+import functools
+import io
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bench_cues import SilentPlayer, install_gpio_stand_in
+from cue_log import CueLog
+from virtual_clock import VirtualClock, VirtualLoopPolicy
+
+
+class _StampedOutput(io.TextIOBase):
+    # Prefixes each line main prints with the virtual time it was printed at
+
+    def __init__(self, stream, clock):
+        self.stream = stream
+        self.clock = clock
+        self._line_start = True
+
+    def write(self, text):
+        for line in text.splitlines(keepends=True):
+            if self._line_start and line.strip():
+                stamp = datetime.fromtimestamp(self.clock.time()).strftime("%Y-%m-%d %H:%M:%S.%f")
+                self.stream.write(f"[{stamp}] ")
+            self.stream.write(line)
+            self._line_start = line.endswith("\n")
+        return len(text)
+
+
+class _InlineCueLog(CueLog):
+    # Writes each record as it is made: a writer thread would print whole
+    # batches at real-time intervals, stamped with whatever virtual time
+    # it happened to be
+
+    def record(self, index, scheduled, actual, pin, state):
+        super().record(index, scheduled, actual, pin, state)
+        self.flush()
+
+    def start(self):
+        pass
+
+
+def use_virtual_clock(show, clock):
+    """Point main and the modules it times things with at clock"""
+    import cue_scheduler
+    import day_schedule
+    import gpio_trace
+
+    for module in (show, day_schedule, gpio_trace):
+        module.time = clock
+    show.relay_state.clock = clock.monotonic
+    show.audio_player = SilentPlayer(show.AUDIO_FILE, clock.monotonic)
+    show.cue_log = _InlineCueLog()
+
+    # The last SPIN_MARGIN before a cue is spent spinning on the clock,
+    # which a virtual clock never ends; sleep the whole way instead
+    cue_scheduler.SLEEP_FRACTION = 1.0
+    show.wait_until_async = functools.partial(cue_scheduler.wait_until_async, margin=0)
+    show.run_timeline_async = functools.partial(cue_scheduler.run_timeline_async, margin=0)
+
+
+def timeline_lines(events, epoch):
+    """One line per relay level change in the trace, in local wall time"""
+    levels = {}
+    lines = []
+    for t_ns, pin, level in events:
+        if levels.get(pin) == level:
+            continue
+        levels[pin] = level
+        stamp = datetime.fromtimestamp(epoch + t_ns / 1e9).strftime("%Y-%m-%d %H:%M:%S.%f")
+        lines.append(f"{stamp} GPIO {pin:2d} {'HIGH' if level else 'LOW'}")
+    return lines
+
+
+def parse_start(text):
+    if text is None:
+        return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    return datetime.strptime(text, "%Y-%m-%d %H:%M")
+
+
+def simulate(show, start, hours, presses=(), verbose=False):
+    """Run show.main() from start for hours; return the relay change timeline"""
+    clock = VirtualClock(start.timestamp())
+    use_virtual_clock(show, clock)
+    show.SYNC_ROLE = None
+    show.METRICS_ADDRESS = None
+    show.BUTTON_PIN = None
+    show.LIGHT_MODE = "cues"
+
+    policy = VirtualLoopPolicy(clock)
+    new_event_loop = policy.new_event_loop
+
+    def start_loop():
+        # Stop the run at the end and press the button at the given times
+        loop = new_event_loop()
+        loop.call_at(hours * 3600, show.controller.stop)
+        for press in presses:
+            loop.call_at((press - start).total_seconds(), show.controller.request_show)
+        return loop
+
+    policy.new_event_loop = start_loop
+    output = _StampedOutput(sys.stdout, clock) if verbose else io.StringIO()
+    asyncio.set_event_loop_policy(policy)
+    try:
+        with contextlib.redirect_stdout(output):
+            show.main()
+    finally:
+        asyncio.set_event_loop_policy(None)
+    return timeline_lines(show.gpio_trace.events(), clock.epoch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--start", help='local "YYYY-MM-DD HH:MM" (default: midnight today)')
+    parser.add_argument("--hours", type=float, default=24.0)
+    parser.add_argument("--press", action="append", default=[], metavar="HH:MM",
+                        help="press the show button at this time (repeatable)")
+    parser.add_argument("--show", help="play SHOWS_DIR/SHOW.show instead of main.CUES")
+    parser.add_argument("--timeline", help="write the relay changes to this file")
+    parser.add_argument("--compare", help="diff the relay changes against this file")
+    parser.add_argument("--trace", help="also save main's GPIO trace here")
+    parser.add_argument("--verbose", action="store_true",
+                        help="show main's output, stamped with the virtual time")
+    args = parser.parse_args()
+
+    start = parse_start(args.start)
+    presses = []
+    for text in args.press:
+        at = datetime.combine(start.date(), datetime.strptime(text, "%H:%M").time())
+        presses.append(at if at >= start else at + timedelta(days=1))
+
+    install_gpio_stand_in()
+    import main as show
+
+    show.SHOW_NAME = args.show
+    show.TRACE_FILE = args.trace or os.devnull
+
+    wall_start = time.perf_counter()
+    lines = simulate(show, start, args.hours, presses, args.verbose)
+    wall = time.perf_counter() - wall_start
+
+    print(f"Simulated {args.hours:g} h from {start:%Y-%m-%d %H:%M} in {wall:.2f} s: "
+          f"{show.shows_played.value} shows, {len(lines)} relay changes")
+    if args.timeline:
+        with open(args.timeline, "w") as f:
+            f.write("".join(line + "\n" for line in lines))
+    if args.compare:
+        with open(args.compare) as f:
+            expected = f.read().splitlines()
+        changes = list(difflib.unified_diff(expected, lines, args.compare, "simulated", lineterm=""))
+        print("\n".join(changes) if changes else f"Same relay changes as {args.compare}")
+        sys.exit(1 if changes else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,60 @@
 #!/usr/bin/env python3
 
-import time
 import signal
 import sys
+
 import RPi.GPIO as GPIO
 
+from button_events import Button, InputEvents
+
+# from EmulatorGUI import GPIO
+
 BUTTON_PIN = 18  # BCM
 
+inputs = None
+
+
 def cleanup(sig=None, frame=None):
     print("\nCleaning up GPIO, exiting.")
+    if inputs:
+        inputs.stop()
     GPIO.cleanup()
     sys.exit(0)
 
+
+def pressed(button):
+    print(f"[EVENT] Button pressed on GPIO {button.pin} "
+          f"({button.press_latency * 1000:.1f} ms after the edge)")
+
+
+def released(button):
+    print(f"[EVENT] Button released on GPIO {button.pin}")
+
+
+def long_pressed(button):
+    print(f"[EVENT] Long press on GPIO {button.pin}")
+
+
 def main():
+    global inputs
+
     signal.signal(signal.SIGINT, cleanup)
     signal.signal(signal.SIGTERM, cleanup)
 
     GPIO.setmode(GPIO.BCM)
-    GPIO.setup(BUTTON_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+
+    # Edge detection wakes us on a change; no polling
+    inputs = InputEvents(GPIO)
+    inputs.add(Button(BUTTON_PIN, on_press=pressed, on_release=released,
+                      on_long_press=long_pressed))
+    inputs.start()
 
     print("Ready.")
     print(f"Short GPIO {BUTTON_PIN} to GND to trigger.")
     print("Ctrl+C to exit.\n")
 
-    last_state = GPIO.input(BUTTON_PIN)
-
     while True:
-        state = GPIO.input(BUTTON_PIN)
-
-        # Detect HIGH -> LOW transition
-        if last_state == GPIO.HIGH and state == GPIO.LOW:
-            print(f"[EVENT] Button pressed on GPIO {BUTTON_PIN}")
-
-        last_state = state
-        time.sleep(0.01)  # 10 ms polling (instant for humans)
+        signal.pause()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,130 @@
+"""Simulated time for running the show controller faster than real time.
+
+VirtualClock stands in for the time module (monotonic(), time(), sleep()
+and friends) but only moves when something sleeps, and then straight to
+the end of the sleep. VirtualEventLoop is an asyncio loop on that clock:
+when no I/O is ready it jumps the clock to the next timer instead of
+waiting for it, so hours of asyncio.sleep() between cues take no time at
+all while every deadline still lands exactly where it was scheduled.
+
+    clock = VirtualClock(start=time.time())
+    asyncio.set_event_loop_policy(VirtualLoopPolicy(clock))
+    asyncio.run(...)   # runs on clock
+
+simulate.py uses this to replay whole days of main.py.
+"""
+
+import asyncio
+import math
+import selectors
+import time
+from datetime import datetime
+
+
+class VirtualClock:
+    """A clock that only advances when told to, in whole nanoseconds"""
+
+    def __init__(self, start=0.0):
+        # Wall-clock time() at monotonic() == 0
+        self.epoch = start
+        self._ns = 0
+
+    def __getattr__(self, name):
+        # strftime(), process_time() and the rest come from the time module
+        return getattr(time, name)
+
+    def advance(self, seconds):
+        # At least a nanosecond, so a tiny sleep can never leave a deadline
+        # unreached forever
+        if seconds > 0:
+            self._ns += max(1, math.ceil(seconds * 1e9))
+
+    def monotonic(self):
+        return self._ns / 1e9
+
+    def monotonic_ns(self):
+        return self._ns
+
+    perf_counter = monotonic
+    perf_counter_ns = monotonic_ns
+
+    def time(self):
+        return self.epoch + self._ns / 1e9
+
+    def time_ns(self):
+        return round(self.epoch * 1e9) + self._ns
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+
+    def now(self, tz=None):
+        """datetime.now() on this clock"""
+        return datetime.fromtimestamp(self.time(), tz)
+
+
+class _VirtualSelector(selectors.BaseSelector):
+    # Real file descriptors, virtual waiting
+
+    def __init__(self, clock):
+        self.clock = clock
+        self._selector = selectors.DefaultSelector()
+
+    def register(self, fileobj, events, data=None):
+        return self._selector.register(fileobj, events, data)
+
+    def unregister(self, fileobj):
+        return self._selector.unregister(fileobj)
+
+    def modify(self, fileobj, events, data=None):
+        return self._selector.modify(fileobj, events, data)
+
+    def select(self, timeout=None):
+        ready = self._selector.select(0)
+        if ready or timeout == 0:
+            return ready
+        if timeout is None:
+            # No timers at all: only real I/O can wake the loop
+            return self._selector.select(None)
+        self.clock.advance(timeout)
+        return []
+
+    def get_map(self):
+        return self._selector.get_map()
+
+    def close(self):
+        self._selector.close()
+
+
+class VirtualEventLoop(asyncio.SelectorEventLoop):
+    """An event loop whose time() is clock.monotonic() and never waits on timers.
+
+    run_in_executor() (and so asyncio.to_thread()) calls the function right
+    away on the loop's thread: a worker thread would take real time while
+    the clock jumped ahead without it.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        super().__init__(_VirtualSelector(clock))
+
+    def time(self):
+        return self.clock.monotonic()
+
+    def run_in_executor(self, executor, func, *args):
+        future = self.create_future()
+        try:
+            future.set_result(func(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class VirtualLoopPolicy(asyncio.DefaultEventLoopPolicy):
+    """Makes asyncio.run() and new_event_loop() use VirtualEventLoop"""
+
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+
+    def new_event_loop(self):
+        return VirtualEventLoop(self.clock)